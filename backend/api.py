@@ -1,18 +1,35 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from src.transcriber import AudioTranscriber
 from src.analyzer import PedagogicalAnalyzer
+from src.analysis_model import EditedAnalysis, parse_analysis
 from src.report_generator import ReportGenerator
+from src.pipeline import ClassAnalysisPipeline
+from src.jobs import JobManager
+from src.batch_renderer import BatchRenderer
+from src.image_encoder import ImageEncoder
+from src.log import configure_logging, log_context
+from src.metrics import BYTES, REGISTRY, STAGE_ERRORS, STAGE_SECONDS
 from dotenv import load_dotenv
+import asyncio
 import shutil
+import io
 import os
 import json
-import ffmpeg
+import logging
+import mimetypes
+import tempfile
+import time
 
 # Cargar variables de entorno desde .env
 load_dotenv()
 
+# Logs a stderr desde un hilo aparte (LOG_LEVEL, LOG_FORMAT=text|json)
+configure_logging()
+logger = logging.getLogger("api")
+
 app = FastAPI()
 
 # Permitir que React se conecte
@@ -23,118 +40,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Mide cada petición por ruta (la plantilla, no la URL, para no crear una serie por id)"""
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        STAGE_ERRORS.inc(stage=_route_stage(request))
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=_route_stage(request))
+    return response
+
+def _route_stage(request: Request) -> str:
+    route = request.scope.get("route")
+    return f"http {request.method} {route.path if route else 'sin_ruta'}"
+
 # Cargar modelos al iniciar (puede tardar un poco)
 transcriber = AudioTranscriber()
 analyzer = PedagogicalAnalyzer()
 report_gen = ReportGenerator()
+pipeline = ClassAnalysisPipeline(transcriber, analyzer)
+
+# Cola de trabajos: el análisis corre en un pool acotado, fuera del event loop
+jobs = JobManager(max_workers=int(os.getenv("MAX_CONCURRENT_JOBS", "2")))
+
+# Pool de procesos para generar reportes en lote (uno por núcleo)
+batch_renderer = BatchRenderer()
 
 @app.post("/analyze_class")
 async def analyze_class(
     video: UploadFile = File(...),
     student_name: str = Form(...),
-    teacher_name: str = Form(...)
+    teacher_name: str = Form(...),
+    regenerate: bool = Form(False)
 ):
-    """Paso 1: Analiza el video y retorna el análisis sin generar reporte"""
-    temp_video = f"temp_video_{video.filename}"
-    temp_audio = "temp_audio.wav"
-    
-    try:
-        # 1. Guardar video
-        with open(temp_video, "wb") as buffer:
-            shutil.copyfileobj(video.file, buffer)
-        
-        # 2. Extraer audio del video usando ffmpeg (si está disponible)
-        print("🎬 Extrayendo audio del video...")
-        try:
-            (
-                ffmpeg
-                .input(temp_video)
-                .output(temp_audio, acodec='pcm_s16le', ac=1, ar='16k')
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
-            )
-        except (ffmpeg.Error, FileNotFoundError) as e:
-            # Fallback: copiar el archivo directamente (útil para archivos WAV)
-            print(f"⚠️  FFmpeg no disponible o error: {e}")
-            print("📋 Usando archivo directo (debe ser WAV o formato compatible)")
-            shutil.copy(temp_video, temp_audio)
-        
-        # 3. Transcribir (Whisper)
-        print("📝 Transcribiendo video...")
-        transcript = transcriber.transcribe(temp_audio)
-        
-        # 4. Analizar (Phi-3 Mini)
-        print("🧠 Analizando clase...")
-        raw_analysis = analyzer.analyze_class(transcript)
-        
-        # Intentar parsear JSON del análisis con mejor extracción
-        try:
-            # Buscar el JSON en la respuesta
-            start = raw_analysis.find('{')
-            end = raw_analysis.rfind('}') + 1
-            
-            if start >= 0 and end > start:
-                json_str = raw_analysis[start:end]
-                print(f"📊 JSON extraído:\n{json_str}")
-                json_analysis = json.loads(json_str)
-                
-                # Validar que tiene los campos esperados
-                required_fields = ["objetivos", "desarrollo", "actitud", "recomendaciones"]
-                for field in required_fields:
-                    if field not in json_analysis:
-                        print(f"⚠️  Campo faltante: {field}")
-                        raise ValueError(f"Campo {field} no encontrado en análisis")
-                
-                print("✅ JSON válido con todos los campos")
-            else:
-                raise ValueError("No se encontró JSON en la respuesta")
-                
-        except Exception as parse_error:
-            print(f"⚠️  Error parseando JSON: {parse_error}")
-            print(f"📄 Respuesta completa del modelo:\n{raw_analysis}")
-            
-            # Si falla, crear estructura básica
-            json_analysis = {
-                "objetivos": ["Análisis de la clase"],
-                "desarrollo": raw_analysis[:500] if len(raw_analysis) > 500 else raw_analysis,
-                "actitud": 85,
-                "recomendaciones": "Continuar con el plan de estudios."
-            }
+    """Paso 1: Encola el análisis del video y retorna el id del trabajo"""
+    workdir = tempfile.mkdtemp(prefix="class_")
+    extension = os.path.splitext(video.filename or "")[1]
 
-        return {
-            "status": "success",
-            "transcript": transcript,
-            "report": json_analysis
-        }
+    # El trabajo se queda con el archivo subido y lo envía directo a ffmpeg,
+    # sin copiarlo otra vez a disco
+    source = _detach_upload(video)
 
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return {"status": "error", "message": str(e)}
-    
+    job = jobs.submit(_run_analysis, source, extension, workdir, regenerate)
+    with log_context(job_id=job.id):
+        logger.info(f"Trabajo {job.id} encolado ({video.filename})", extra={"upload_name": video.filename})
+    return {"status": "queued", "job_id": job.id, "events": f"/jobs/{job.id}/events"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Consulta la etapa, el progreso y el resultado de un análisis"""
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Trabajo no encontrado"})
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: str = Header(None)):
+    """Server-Sent Events del análisis: etapas, cada fragmento transcrito al terminar,
+    los tokens del análisis a medida que el modelo los genera y el resultado final"""
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Trabajo no encontrado"})
+
+    # Al reconectar, EventSource envía el último id recibido y se continúa desde ahí
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def stream():
+        async for message in job.listen(after):
+            if message is None:
+                # Comentario SSE para que los proxies no cierren la conexión inactiva
+                yield ": ping\n\n"
+                continue
+            event_id, event, data = message
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _detach_upload(upload: UploadFile):
+    """Toma el archivo temporal del upload para que FastAPI no lo cierre al responder"""
+    source = upload.file
+    upload.file = io.BytesIO()
+    BYTES.inc(source.seek(0, io.SEEK_END), kind="upload")
+    source.seek(0)
+    return source
+
+def _run_analysis(job, source, extension, workdir, regenerate=False):
+    try:
+        return pipeline.run(source, workdir, extension, progress=job.update, regenerate=regenerate,
+                            emit=job.emit, has_listeners=lambda: job.has_listeners)
     finally:
         # Limpiar archivos temporales
-        for temp_file in [temp_video, temp_audio]:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+        source.close()
+        shutil.rmtree(workdir, ignore_errors=True)
 
+# Los endpoints que dibujan con Pillow son `def`: FastAPI los corre en su pool de hilos
+# y el render no detiene el event loop (consultas de trabajos, SSE)
 @app.post("/generate_report")
-async def generate_report(
+def generate_report(
     analysis: str = Form(...),
     session_photo: UploadFile = File(None),
     logo: UploadFile = File(None),
+    logo_id: str = Form(None),
     student_name: str = Form(...),
     teacher_name: str = Form(...),
     session_number: int = Form(1),
     total_sessions: int = Form(8),
-    session_date: str = Form(None)
+    session_date: str = Form(None),
+    output_format: str = Form(None),
+    inline: bool = Form(False)
 ):
     """Paso 2: Genera el reporte visual a partir del análisis editado"""
     temp_session = None
-    temp_logo = None
     
     try:
-        # 1. Parsear análisis
-        json_analysis = json.loads(analysis)
+        # 1. Validar el análisis editado (los campos pueden quedar vacíos)
+        json_analysis = parse_analysis(analysis, EditedAnalysis).model_dump()
         
         # 2. Guardar foto de sesión si existe
         if session_photo:
@@ -142,23 +169,37 @@ async def generate_report(
             with open(temp_session, "wb") as buffer:
                 shutil.copyfileobj(session_photo.file, buffer)
         
-        # 3. Guardar logo si existe
-        if logo:
-            temp_logo = f"temp_logo_{logo.filename}"
-            with open(temp_logo, "wb") as buffer:
-                shutil.copyfileobj(logo.file, buffer)
+        # 3. Registrar el logo (o usar uno ya registrado con POST /logos)
+        logo_id = _resolve_logo_id(logo, logo_id)
         
         # 4. Generar reporte visual
-        print("🎨 Generando reporte visual...")
+        logger.info("Generando reporte visual...")
+        encoder = ImageEncoder(output_format) if output_format else report_gen.encoder
+        if inline:
+            # Se codifica en memoria y se devuelve en la misma respuesta, sin pasar por disco
+            data = report_gen.encode_report(
+                analysis=json_analysis,
+                session_photo_path=temp_session,
+                logo_id=logo_id,
+                student_name=student_name,
+                teacher_name=teacher_name,
+                session_number=session_number,
+                total_sessions=total_sessions,
+                session_date=session_date,
+                encoder=encoder
+            )
+            return Response(content=data, media_type=encoder.media_type)
+        
         report_path = report_gen.generate_report(
             analysis=json_analysis,
             session_photo_path=temp_session,
-            logo_path=temp_logo,
+            logo_id=logo_id,
             student_name=student_name,
             teacher_name=teacher_name,
             session_number=session_number,
             total_sessions=total_sessions,
-            session_date=session_date
+            session_date=session_date,
+            output_format=output_format
         )
         
         # Obtener nombre del archivo generado
@@ -170,19 +211,134 @@ async def generate_report(
         }
 
     except Exception as e:
-        print(f"❌ Error: {e}")
-        return {"status": "success", "report_image": f"/{report_path}"}
+        logger.exception(f"Error generando el reporte: {e}")
+        return {"status": "error", "message": str(e)}
     
     finally:
         # Limpiar archivos temporales
-        for temp_file in [temp_session, temp_logo]:
-            if temp_file and os.path.exists(temp_file):
-                os.remove(temp_file)
+        if temp_session and os.path.exists(temp_session):
+            os.remove(temp_session)
+
+def _resolve_logo_id(logo, logo_id):
+    """Registra el logo subido; si no hay archivo, valida el id recibido"""
+    if logo:
+        return report_gen.logos.register(logo.file.read()).id
+    if logo_id and report_gen.logos.get(logo_id) is None:
+        raise ValueError(f"Logo no encontrado: {logo_id}")
+    return logo_id
+
+@app.post("/logos")
+def register_logo(logo: UploadFile = File(...)):
+    """Registra el logo de la institución una vez; los reportes lo referencian por su id"""
+    try:
+        asset = report_gen.logos.register(logo.file.read())
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", **asset.to_dict()}
+
+@app.post("/generate_reports_batch")
+async def generate_reports_batch(
+    reports: str = Form(...),
+    logo: UploadFile = File(None),
+    logo_id: str = Form(None),
+    session_photos: list[UploadFile] = File(None),
+    output_format: str = Form(None)
+):
+    """Genera los reportes de todo un grupo y los devuelve en un ZIP a medida que se terminan"""
+    try:
+        report_list = json.loads(reports)
+        if not isinstance(report_list, list) or not report_list:
+            raise ValueError("'reports' debe ser una lista no vacía")
+        for i, report in enumerate(report_list):
+            if not isinstance(report, dict) or not isinstance(report.get("analysis"), dict):
+                raise ValueError("Cada reporte necesita un objeto 'analysis'")
+            try:
+                report["analysis"] = parse_analysis(report["analysis"], EditedAnalysis).model_dump()
+            except ValueError as e:
+                raise ValueError(f"Reporte {i + 1}: análisis inválido ({e})")
+        output_format = ImageEncoder(output_format).output_format
+        # El logo se procesa una sola vez; los procesos lo leen del registro por su id
+        logo_id = await run_in_threadpool(_resolve_logo_id, logo, logo_id)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    
+    # Fotos compartidas por los reportes del lote
+    workdir = tempfile.mkdtemp(prefix="batch_")
+    photo_paths = {}
+    for photo in session_photos or []:
+        name = os.path.basename(photo.filename or "")
+        if not name:
+            continue
+        photo_paths[name] = os.path.join(workdir, f"photo_{len(photo_paths)}_{name}")
+        with open(photo_paths[name], "wb") as buffer:
+            shutil.copyfileobj(photo.file, buffer)
+    
+    for report in report_list:
+        report["session_photo_path"] = photo_paths.get(report.pop("session_photo", None))
+    
+    logger.info(f"Generando {len(report_list)} reportes en {batch_renderer.max_workers} procesos...")
+    
+    async def stream():
+        try:
+            async for chunk in batch_renderer.stream_zip(report_list, logo_id, output_format):
+                yield chunk
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="reportes.zip"'}
+    )
+
+@app.on_event("startup")
+async def start_report_sweeper():
+    # La retención por antigüedad no puede depender de que se guarden reportes nuevos
+    async def sweep():
+        while True:
+            await asyncio.sleep(report_gen.store.sweep_interval)
+            try:
+                await asyncio.to_thread(report_gen.store.evict)
+            except Exception:
+                logger.exception("Error al limpiar reportes antiguos")
+    app.state.report_sweeper = asyncio.create_task(sweep())
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    # Trabajos en cola cancelados, pools de análisis y de reportes detenidos
+    jobs.shutdown()
+    batch_renderer.shutdown()
+    app.state.report_sweeper.cancel()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Contadores de aciertos/fallos de las cachés"""
+    return {
+        "transcripts": transcriber.cache.stats(),
+        "analyses": analyzer.cache.stats(),
+        "report_templates": report_gen.templates.stats(),
+        "reports": report_gen.rendered.stats(),
+        "report_store": report_gen.store.stats(),
+        "logos": report_gen.logos.assets.stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Latencia por etapa, bytes, audio, tokens y cachés en formato de texto de Prometheus"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/reports/{filename}")
-async def get_report(filename: str):
+async def get_report(filename: str, if_none_match: str = Header(None)):
     """Endpoint para servir las imágenes de reportes generados"""
-    file_path = f"reports/{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="image/png")
-    return {"status": "error", "message": "Reporte no encontrado"}
\ No newline at end of file
+    file_path = report_gen.store.path(filename)
+    if file_path is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "Reporte no encontrado"})
+    
+    # El nombre es el hash del contenido: el archivo nunca cambia y se puede cachear para siempre
+    etag = report_gen.store.etag(filename)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    media_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    return FileResponse(file_path, media_type=media_type, headers=headers)
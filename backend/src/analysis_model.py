@@ -0,0 +1,61 @@
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+
+class AnalysisParseError(ValueError):
+    """The text is not a valid class analysis."""
+
+
+class ClassAnalysis(BaseModel):
+    """A class analysis, as generated by the LLM and edited in the frontend."""
+
+    # Unknown keys are dropped; a numeric attitude score becomes its text
+    model_config = ConfigDict(str_strip_whitespace=True, coerce_numbers_to_str=True)
+
+    objetivos: list[str] = Field(min_length=1)
+    desarrollo: str = Field(min_length=1)
+    actitud: str = Field(min_length=1)
+    recomendaciones: str = Field(min_length=1)
+
+    @field_validator("objetivos", mode="before")
+    @classmethod
+    def _single_objective(cls, value):
+        # Models sometimes answer a single objective as a plain string
+        return [value] if isinstance(value, str) else value
+
+
+class EditedAnalysis(ClassAnalysis):
+    """An analysis after the teacher edited it: any field may be left empty."""
+
+    objetivos: list[str] = []
+    desarrollo: str = ""
+    actitud: str = ""
+    recomendaciones: str = ""
+
+
+def parse_analysis(source, model=ClassAnalysis) -> ClassAnalysis:
+    """Validates an analysis given as a dict or as JSON text, which may be
+    wrapped in a markdown fence or surrounded by prose.
+
+    Raises AnalysisParseError with a short description of every problem.
+    """
+    try:
+        if isinstance(source, dict):
+            return model.model_validate(source)
+        return model.model_validate_json(_json_object(source or ""))
+    except ValidationError as e:
+        raise AnalysisParseError(_describe_errors(e)) from e
+
+
+def _describe_errors(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, item['loc'])) or 'json'}: {item['msg']}"
+        for item in error.errors(include_url=False)
+    )
+
+
+def _json_object(text: str) -> str:
+    start = text.find("{")
+    end = text.rfind("}") + 1
+    if start < 0 or end <= start:
+        raise AnalysisParseError("no JSON object found in the response")
+    return text[start:end]
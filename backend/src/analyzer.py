@@ -1,96 +1,180 @@
 import os
 import json
-from groq import Groq
+import hashlib
+import asyncio
+import logging
+from src.analysis_model import AnalysisParseError, parse_analysis
+from src.cache import TieredCache
+from src.groq_client import GroqServiceError, failed_generation, get_gateway
+from src.metrics import record_cache, timed
+from src.tokens import estimate_tokens, split_by_tokens
+
+logger = logging.getLogger(__name__)
 
 class PedagogicalAnalyzer:
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "GROQ_API_KEY not found. "
-                "Please add your API key to the .env file"
-            )
+    MODEL = "llama-3.3-70b-versatile"
+    TEMPERATURE = 0.3
+    MAX_TOKENS = 1500
+    SUMMARY_MAX_TOKENS = 400
+    # Bump whenever the prompts change so cached analyses are not reused
+    PROMPT_VERSION = "3"
+    JSON_MODE = {"type": "json_object"}
+    
+    ANALYSIS_SHAPE = """{
+  "objetivos": ["objetivo 1", "objetivo 2", "objetivo 3"],
+  "desarrollo": "resumen detallado de la clase en máximo 200 palabras",
+  "actitud": "descripción textual de la actitud y participación de los estudiantes (ej: 'Excelente actitud. Muy participativo y enfocado.')",
+  "recomendaciones": "recomendaciones para mejorar en máximo 150 palabras"
+}"""
+    
+    def __init__(self, gateway=None):
+        self.gateway = gateway or get_gateway()
+        self.cache = TieredCache(
+            os.getenv("ANALYSIS_CACHE_DIR", "cache/analyses"),
+            max_entries=int(os.getenv("ANALYSIS_CACHE_MEMORY_ENTRIES", "256")),
+            max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_MB", "50")) * 1024 * 1024,
+            ttl=float(os.getenv("ANALYSIS_CACHE_TTL_HOURS", "168")) * 3600,
+        )
+        # Transcripts above this estimate are analyzed with map-reduce
+        self.long_transcript_tokens = int(os.getenv("LONG_TRANSCRIPT_TOKENS", "6000"))
+        self.section_tokens = int(os.getenv("SECTION_TOKENS", "3000"))
+        self.summary_model = os.getenv("SUMMARY_MODEL", "llama-3.1-8b-instant")
+        self.max_concurrency = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+        logger.info("Groq API initialized")
+    
+    def analyze_class(self, transcript: str, regenerate: bool = False, on_token=None) -> dict:
+        """Returns the validated analysis as a dict; raises AnalysisParseError
+        when the model output cannot be repaired."""
+        logger.info("Analyzing class...")
         
-        self.client = Groq(api_key=api_key)
-        print("✅ Groq API initialized")
+        key = self._cache_key(transcript)
+        if not regenerate:
+            cached = self.cache.get(key)
+            record_cache("analyses", cached is not None)
+            if cached is not None:
+                logger.info("Analysis cache hit")
+                return cached
+        
+        analysis = self.gateway.run(self._generate_analysis(transcript, on_token))
+        self.cache.set(key, analysis)
+        return analysis
+    
+    def _cache_key(self, transcript: str) -> str:
+        payload = json.dumps(
+            [
+                transcript, self.PROMPT_VERSION, self.MODEL, self.TEMPERATURE, self.MAX_TOKENS,
+                self.summary_model, self.long_transcript_tokens, self.section_tokens,
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
     
-    def analyze_class(self, transcript: str) -> dict:
-        print("🧠 Analyzing class...")
-        print(f"💭 Generating analysis with Groq ({len(transcript)} characters)...")
+    async def _generate_analysis(self, transcript: str, on_token=None) -> dict:
+        logger.info(f"Generating analysis with Groq ({len(transcript)} characters)...")
         
-        prompt = self._build_prompt(transcript)
+        tokens = estimate_tokens(transcript)
+        if tokens > self.long_transcript_tokens:
+            logger.info(f"Long transcript (~{tokens} tokens), summarizing sections first...")
+            summaries = await self._summarize_sections(transcript)
+            prompt = self._build_prompt("\n\n".join(summaries), "RESÚMENES DE LA CLASE POR SECCIÓN (en orden)")
+        else:
+            prompt = self._build_prompt(transcript)
         
+        # Only the final analysis is streamed; section summaries are intermediate.
+        # Groq's JSON mode does not stream, so streamed answers rely on the repair below
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama-3.3-70b-versatile",
-                temperature=0.3,
-                max_tokens=1500,
+            response, tokens_used = await self._complete(
+                prompt, self.MODEL, self.MAX_TOKENS, on_token,
+                response_format=None if on_token else self.JSON_MODE,
             )
-            
-            response = chat_completion.choices[0].message.content
-            
-            tokens_used = chat_completion.usage.total_tokens
-            print(f"✅ Analysis generated in ~{tokens_used} tokens")
-            print(f"📄 Model response:\n{response[:200]}...")
-            
-            analysis = self._extract_json(response)
-            
-            if self._validate_analysis(analysis):
-                print("✅ Valid JSON with all fields")
-                return analysis
-            else:
-                print("⚠️  Invalid JSON structure")
-                return self._get_default_analysis()
-                
-        except Exception as e:
-            print(f"❌ Error in analysis: {e}")
-            return self._get_default_analysis()
+            logger.info(f"Analysis generated in ~{tokens_used} tokens")
+        except GroqServiceError as e:
+            # JSON mode rejects invalid output with a 400, but still returns what was generated
+            response = failed_generation(e)
+            if response is None:
+                raise
+        
+        logger.debug(f"Model response:\n{response[:200]}...")
+        
+        try:
+            return self._parse(response)
+        except AnalysisParseError as e:
+            # Fixing the answer costs a fraction of analyzing the transcript again
+            logger.warning(f"Invalid analysis ({e}), asking the model to repair it...")
+            repaired, tokens_used = await self._complete(
+                self._build_repair_prompt(response, str(e)), self.MODEL, self.MAX_TOKENS,
+                response_format=self.JSON_MODE,
+            )
+            logger.info(f"Analysis repaired in ~{tokens_used} tokens")
+            return self._parse(repaired)
+    
+    def _parse(self, response: str) -> dict:
+        with timed("json_parse"):
+            return parse_analysis(response).model_dump()
     
-    def _build_prompt(self, transcript: str) -> str:
+    async def _complete(self, prompt: str, model: str, max_tokens: int, on_token=None, response_format=None):
+        params = {"response_format": response_format} if response_format else {}
+        return await self.gateway.chat(
+            prompt,
+            model=model,
+            max_tokens=max_tokens,
+            estimated_tokens=estimate_tokens(prompt),
+            on_token=on_token,
+            temperature=self.TEMPERATURE,
+            **params,
+        )
+    
+    async def _summarize_sections(self, transcript: str) -> list:
+        sections = split_by_tokens(transcript, self.section_tokens)
+        logger.info(f"{len(sections)} sections, summarizing up to {self.max_concurrency} at a time with {self.summary_model}...")
+        
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        
+        async def summarize(i):
+            prompt = self._build_section_prompt(sections[i], i + 1, len(sections))
+            async with semaphore:
+                summary, tokens_used = await self._complete(prompt, self.summary_model, self.SUMMARY_MAX_TOKENS)
+            logger.info(f"Section {i+1}/{len(sections)} summarized (~{tokens_used} tokens)")
+            return f"[Sección {i+1}/{len(sections)}] {summary.strip()}"
+        
+        # gather() keeps sections in class order
+        return await asyncio.gather(*(summarize(i) for i in range(len(sections))))
+    
+    def _build_section_prompt(self, section: str, number: int, total: int) -> str:
+        return f"""Eres un analista pedagógico experto. Este es el fragmento {number} de {total} de la transcripción de una clase.
+
+Resume en máximo 150 palabras, en español y en texto plano:
+- los temas y objetivos que se trabajan,
+- cómo se desarrolla la actividad,
+- la actitud y participación de los estudiantes,
+- dificultades o puntos de mejora observados.
+
+FRAGMENTO:
+{section}
+
+Resumen:"""
+    
+    def _build_prompt(self, transcript: str, source: str = "TRANSCRIPCIÓN DE LA CLASE") -> str:
         return f"""Eres un analista pedagógico experto. Analiza esta transcripción de clase y genera un análisis en formato JSON.
 
 IMPORTANTE: Responde ÚNICAMENTE con el objeto JSON, sin texto adicional antes o después.
 
 Estructura JSON requerida:
-{{
-  "objetivos": ["objetivo 1", "objetivo 2", "objetivo 3"],
-  "desarrollo": "resumen detallado de la clase en máximo 200 palabras",
-  "actitud": "descripción textual de la actitud y participación de los estudiantes (ej: 'Excelente actitud. Muy participativo y enfocado.')",
-  "recomendaciones": "recomendaciones para mejorar en máximo 150 palabras"
-}}
+{self.ANALYSIS_SHAPE}
 
-TRANSCRIPCIÓN DE LA CLASE:
+{source}:
 {transcript}
 
 Genera ahora el análisis en JSON puro (sin markdown, sin explicaciones):"""
     
-    def _extract_json(self, response: str) -> dict:
-        try:
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
-            
-            analysis = json.loads(response)
-            print(f"📊 JSON extracted:\n{json.dumps(analysis, indent=2, ensure_ascii=False)}")
-            return analysis
-        except json.JSONDecodeError as e:
-            print(f"⚠️  JSON parsing error: {e}")
-            return self._get_default_analysis()
-    
-    def _validate_analysis(self, analysis: dict) -> bool:
-        required_keys = ['objetivos', 'desarrollo', 'actitud', 'recomendaciones']
-        return all(key in analysis for key in required_keys)
-    
-    def _get_default_analysis(self) -> dict:
-        return {
-            "objetivos": ["Revisar contenido de la clase", "Fomentar participación", "Evaluar comprensión"],
-            "desarrollo": "Clase enfocada en el aprendizaje activo y la participación de los estudiantes.",
-            "actitud": "Actitud positiva y participativa durante la sesión.",
-            "recomendaciones": "Continuar fomentando la participación activa y el diálogo en clase."
-        }
\ No newline at end of file
+    def _build_repair_prompt(self, response: str, errors: str) -> str:
+        return f"""Esta respuesta debía ser un análisis de clase en JSON, pero no es válida.
+
+ERRORES:
+{errors}
+
+RESPUESTA:
+{response}
+
+Corrígela conservando su contenido. Responde ÚNICAMENTE con el objeto JSON con esta estructura:
+{self.ANALYSIS_SHAPE}"""
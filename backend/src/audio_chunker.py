@@ -0,0 +1,72 @@
+import bisect
+import io
+import wave
+
+READ_FRAMES = 64 * 1024
+
+
+class AudioChunker:
+    """Splits a PCM WAV file into windows without decoding the whole recording.
+
+    Only the frames of the requested window are read (via seek), and each
+    chunk is rebuilt as a small in-memory WAV, so peak memory is bounded by
+    the chunk size rather than by the length of the class.
+    """
+
+    def __init__(self, audio_path: str):
+        self.audio_path = audio_path
+        try:
+            with wave.open(audio_path, "rb") as wav:
+                self.params = wav.getparams()
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"Chunking requires a PCM WAV file ({audio_path}): {e}")
+
+        self.frame_rate = self.params.framerate
+        self.frame_size = self.params.sampwidth * self.params.nchannels
+        self.total_frames = self.params.nframes
+
+    @property
+    def duration(self) -> float:
+        return self.total_frames / self.frame_rate
+
+    def windows(self, chunk_seconds: float, max_chunk_bytes: int = None, cut_points: list = None) -> list:
+        """Fixed-length windows, ending at the latest pause in the last quarter when one exists."""
+        frames_per_chunk = max(1, int(chunk_seconds * self.frame_rate))
+        if max_chunk_bytes:
+            frames_per_chunk = min(frames_per_chunk, max_chunk_bytes // self.frame_size)
+
+        cuts = sorted(int(point * self.frame_rate) for point in cut_points or [])
+        windows = []
+        start = 0
+        while start < self.total_frames:
+            end = min(start + frames_per_chunk, self.total_frames)
+            if end < self.total_frames:
+                i = bisect.bisect_right(cuts, end) - 1
+                if i >= 0 and cuts[i] > start + frames_per_chunk * 3 // 4:
+                    end = cuts[i]
+            windows.append((start, end))
+            start = end
+        return windows
+
+    def read(self, start_frame: int, end_frame: int) -> io.BytesIO:
+        buffer = io.BytesIO()
+        with wave.open(self.audio_path, "rb") as source, wave.open(buffer, "wb") as chunk:
+            chunk.setnchannels(self.params.nchannels)
+            chunk.setsampwidth(self.params.sampwidth)
+            chunk.setframerate(self.frame_rate)
+            chunk.setnframes(end_frame - start_frame)
+
+            source.setpos(start_frame)
+            remaining = end_frame - start_frame
+            while remaining > 0:
+                frames = source.readframes(min(remaining, READ_FRAMES))
+                if not frames:
+                    break
+                chunk.writeframesraw(frames)
+                remaining -= len(frames) // self.frame_size
+
+        buffer.seek(0)
+        return buffer
+
+    def seconds(self, frame: int) -> float:
+        return frame / self.frame_rate
@@ -0,0 +1,78 @@
+import logging
+import os
+import ffmpeg
+from src.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+CODECS = {
+    "flac": {"extension": "flac", "options": {"format": "flac", "acodec": "flac", "compression_level": 8}},
+    "opus": {"extension": "ogg", "options": {"format": "ogg", "acodec": "libopus", "application": "voip", "compression_level": 5}},
+    "wav": None,
+}
+
+
+class AudioEncoder:
+    """Compresses extracted PCM before it is uploaded to Whisper.
+
+    `flac` is lossless (~50% of the WAV size for speech); `opus` at the
+    default 32 kbps is ~8x smaller and keeps most classes under the
+    single-request upload limit. `wav` disables the stage.
+    """
+
+    def __init__(self, codec: str = None, bitrate: str = None):
+        self.codec = (codec or os.getenv("TRANSCRIPTION_CODEC", "opus")).lower()
+        if self.codec not in CODECS:
+            raise ValueError(f"Unsupported TRANSCRIPTION_CODEC '{self.codec}' (use one of: {', '.join(CODECS)})")
+        self.bitrate = bitrate or os.getenv("TRANSCRIPTION_BITRATE", "32k")
+
+    @property
+    def enabled(self) -> bool:
+        return CODECS[self.codec] is not None
+
+    @property
+    def extension(self) -> str:
+        return CODECS[self.codec]["extension"] if self.enabled else "wav"
+
+    def encode_file(self, wav_path: str) -> str:
+        """Encodes the whole file next to `wav_path`; returns `wav_path` if disabled or unavailable."""
+        if not self.enabled:
+            return wav_path
+
+        output_path = f"{os.path.splitext(wav_path)[0]}.{self.extension}"
+        try:
+            with timed("audio_encode"):
+                (
+                    ffmpeg
+                    .input(wav_path)
+                    .output(output_path, **self._options())
+                    .overwrite_output()
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
+        except (ffmpeg.Error, FileNotFoundError) as e:
+            logger.warning(f"{self.codec.upper()} encoding failed, uploading WAV instead: {e}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return wav_path
+
+        wav_mb = os.path.getsize(wav_path) / (1024 * 1024)
+        encoded_mb = os.path.getsize(output_path) / (1024 * 1024)
+        logger.info(f"Encoded to {self.codec.upper()}: {wav_mb:.2f} MB → {encoded_mb:.2f} MB")
+        return output_path
+
+    def encode_window(self, wav_path: str, start: float, duration: float) -> bytes:
+        """Encodes one window of the WAV into memory; ffmpeg seeks, so only that window is read."""
+        with timed("audio_encode"):
+            out, _ = (
+                ffmpeg
+                .input(wav_path, ss=f"{start:.3f}", t=f"{duration:.3f}")
+                .output('pipe:1', **self._options())
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+        return out
+
+    def _options(self) -> dict:
+        options = dict(CODECS[self.codec]["options"], ac=1)
+        if self.codec == "opus":
+            options["audio_bitrate"] = self.bitrate
+        return options
@@ -0,0 +1,157 @@
+import logging
+import os
+import shutil
+import struct
+import threading
+import wave
+import ffmpeg
+from src.metrics import AUDIO_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+READ_SIZE = 1024 * 1024
+
+
+class AudioExtractor:
+    """Decodes an uploaded video/audio stream to 16 kHz mono PCM WAV.
+
+    The upload is piped into ffmpeg's stdin and the PCM is read back from its
+    stdout, so the source is never copied to disk. MP4/MOV files with the
+    moov atom after the media data (what phones record) cannot be decoded
+    from a pipe; they are detected from their box headers and copied to a
+    scratch file inside the request's own directory instead.
+    """
+
+    def extract(self, source, audio_path: str, scratch_dir: str, extension: str = "") -> str:
+        if not self._can_stream(source):
+            logger.info("MP4 without faststart, decoding from a scratch file...")
+            return self._extract_seekable(source, audio_path, scratch_dir, extension)
+
+        logger.info("Extracting audio (streaming into ffmpeg)...")
+        try:
+            frames = self._extract_streaming(source, audio_path)
+            AUDIO_SECONDS.inc(frames / SAMPLE_RATE, kind="extracted")
+            logger.info(f"Audio extracted: {frames / SAMPLE_RATE:.1f} s", extra={"audio_seconds": round(frames / SAMPLE_RATE, 1)})
+            return audio_path
+        except FileNotFoundError as e:
+            # Fallback: use the upload as-is (works for WAV files)
+            logger.warning(f"FFmpeg not available: {e}")
+            logger.info("Using the file directly (must be WAV or a compatible format)")
+            source.seek(0)
+            with open(audio_path, "wb") as buffer:
+                shutil.copyfileobj(source, buffer, READ_SIZE)
+            return audio_path
+        except ffmpeg.Error as e:
+            logger.warning(f"Container needs seeking, spooling to scratch file: {self._stderr(e)}")
+
+        return self._extract_seekable(source, audio_path, scratch_dir, extension)
+
+    def _extract_seekable(self, source, audio_path: str, scratch_dir: str, extension: str) -> str:
+        seekable_path = os.path.join(scratch_dir, f"source{extension}")
+        source.seek(0)
+        with open(seekable_path, "wb") as buffer:
+            shutil.copyfileobj(source, buffer, READ_SIZE)
+
+        try:
+            (
+                ffmpeg
+                .input(seekable_path)
+                .output(audio_path, acodec='pcm_s16le', ac=1, ar=SAMPLE_RATE)
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+        except ffmpeg.Error as e:
+            logger.warning(f"FFmpeg error: {self._stderr(e)}")
+            logger.info("Using the file directly (must be WAV or a compatible format)")
+            shutil.copy(seekable_path, audio_path)
+        finally:
+            os.remove(seekable_path)
+
+        return audio_path
+
+    def _can_stream(self, source) -> bool:
+        """False for ISO media files (MP4, MOV, M4A) whose mdat box comes before moov.
+
+        Only the 8-byte headers of the top-level boxes are read, seeking over
+        their bodies, so this costs a few reads however large the upload is.
+        """
+        try:
+            source.seek(0)
+            position = 0
+            first = True
+            while True:
+                header = source.read(8)
+                if len(header) < 8:
+                    return True
+                size, kind = struct.unpack(">I4s", header)
+                if first and kind != b"ftyp":
+                    return True  # not an ISO media file
+                first = False
+                if kind == b"moov":
+                    return True
+                if kind == b"mdat":
+                    return False
+                if size == 1:
+                    large = source.read(8)
+                    if len(large) < 8:
+                        return True
+                    size = struct.unpack(">Q", large)[0]
+                elif size == 0:
+                    return True  # box runs to the end of the file
+                if size < 8:
+                    return True
+                position += size
+                source.seek(position)
+        finally:
+            source.seek(0)
+
+    def _extract_streaming(self, source, audio_path: str) -> int:
+        process = (
+            ffmpeg
+            .input('pipe:0')
+            .output('pipe:1', format='s16le', acodec='pcm_s16le', ac=1, ar=SAMPLE_RATE)
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdin=True, pipe_stdout=True, pipe_stderr=True)
+        )
+
+        stderr = []
+        feeder = threading.Thread(target=self._feed, args=(source, process.stdin), daemon=True)
+        drain = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        feeder.start()
+        drain.start()
+
+        frames = 0
+        with wave.open(audio_path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            for block in iter(lambda: process.stdout.read(READ_SIZE), b""):
+                wav.writeframes(block)
+                frames += len(block) // 2
+
+        process.wait()
+        feeder.join()
+        drain.join()
+
+        if process.returncode != 0 or frames == 0:
+            raise ffmpeg.Error('ffmpeg', None, b"".join(stderr))
+        return frames
+
+    def _feed(self, source, stdin):
+        try:
+            for block in iter(lambda: source.read(READ_SIZE), b""):
+                stdin.write(block)
+        except (BrokenPipeError, ValueError):
+            # ffmpeg exited before consuming all the input
+            pass
+        finally:
+            try:
+                stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def _stderr(self, error) -> str:
+        if error.stderr:
+            return error.stderr.decode(errors="ignore").strip()[-300:]
+        return str(error)
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.image_encoder import ImageEncoder
+from src.metrics import BYTES, timed
+from src.report_generator import ReportGenerator
+
+logger = logging.getLogger(__name__)
+
+# One generator per worker process, so fonts and templates are reused across renders
+_generator = None
+
+
+def _init_worker():
+    global _generator
+    _generator = ReportGenerator()
+
+
+def _render_report(report: dict, logo_id: str, output_format: str) -> bytes:
+    return _generator.encode_report(
+        analysis=report["analysis"],
+        session_photo_path=report.get("session_photo_path"),
+        session_number=report.get("session_number", 1),
+        total_sessions=report.get("total_sessions", 8),
+        student_name=report.get("student_name", ""),
+        teacher_name=report.get("teacher_name", ""),
+        session_date=report.get("session_date"),
+        logo_id=logo_id,
+        encoder=ImageEncoder(output_format),
+    )
+
+
+def report_filename(index: int, report: dict, extension: str = "png") -> str:
+    student = re.sub(r"[^\w-]+", "_", report.get("student_name") or "reporte").strip("_")
+    return f"{index + 1:03d}_{student}_sesion_{report.get('session_number', 1)}.{extension}"
+
+
+class _ZipBuffer:
+    """Write-only sink for ZipFile; zipfile falls back to data descriptors
+    when the target has no tell(), so entries can be flushed as they are written."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BatchRenderer:
+    """Renders many reports in parallel on a process pool.
+
+    Pillow drawing holds the GIL, so threads would render one report at a
+    time; worker processes scale with the cores. Workers are spawned (not
+    forked) because the API process runs background threads.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.getenv("REPORT_WORKERS") or 0) or os.cpu_count() or 1
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def render(self, reports: list, logo_id: str = None, output_format: str = None):
+        """Yields (index, encoded image or exception) in completion order."""
+        loop = asyncio.get_running_loop()
+
+        executor = self.executor
+
+        async def render_one(index, report):
+            try:
+                # Workers keep their own metrics; the parent records the end-to-end time per report
+                with timed("batch_report"):
+                    data = await loop.run_in_executor(executor, _render_report, report, logo_id, output_format)
+                BYTES.inc(len(data), kind="report")
+                return index, data
+            except BrokenProcessPool as e:
+                # A worker died (e.g. OOM); start a fresh pool for the next batch
+                if self._executor is executor:
+                    self._executor = None
+                return index, e
+            except Exception as e:
+                return index, e
+
+        tasks = [asyncio.ensure_future(render_one(i, report)) for i, report in enumerate(reports)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream_zip(self, reports: list, logo_id: str = None, output_format: str = None):
+        """Yields ZIP bytes; each report is appended as soon as its render finishes."""
+        extension = ImageEncoder(output_format).extension
+        sink = _ZipBuffer()
+        errors = {}
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+            async for index, result in self.render(reports, logo_id, output_format):
+                name = report_filename(index, reports[index], extension)
+                if isinstance(result, Exception):
+                    logger.error(f"Report {name} failed: {result}")
+                    errors[name] = str(result)
+                    continue
+                # Encoded images are already compressed, storing avoids compressing them twice
+                archive.writestr(name, result)
+                yield sink.drain()
+
+            if errors:
+                archive.writestr("errors.txt", "\n".join(f"{name}: {error}" for name, error in errors.items()))
+        yield sink.drain()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
@@ -0,0 +1,189 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def atomic_write(path: str, write, mode: str = "wb"):
+    """Calls `write(f)` on a temp file next to `path` and renames it into place,
+    so readers (other threads or worker processes) never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def scan_entries(directory: str, accept) -> list:
+    """(mtime, size, path) of the files in `directory` whose name passes `accept`."""
+    entries = []
+    for entry in os.scandir(directory):
+        if accept(entry.name):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def evict_oldest(entries: list, max_bytes: int, max_age: float = None):
+    """Deletes entries older than `max_age` seconds, then the least recently
+    touched ones until the rest fit in `max_bytes`."""
+    cutoff = time.time() - max_age if max_age else float("-inf")
+    entries = sorted(entries)
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+class DiskCache:
+    """Size-bounded LRU cache storing one JSON file per key.
+
+    Reads touch the entry's mtime, so eviction (oldest mtime first) follows
+    recency of use. Safe to share between worker threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        atomic_write(self._path(key), lambda f: json.dump(value, f, ensure_ascii=False), "w")
+        self._evict()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _entries(self) -> list:
+        return scan_entries(self.directory, lambda name: name.endswith(".json"))
+
+    def _evict(self):
+        with self._lock:
+            evict_oldest(self._entries(), self.max_bytes)
+
+
+class MemoryCache:
+    """In-process LRU with optional per-entry time-to-live."""
+
+    def __init__(self, max_entries: int, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[0] is not None and entry[0] < time.time()):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, expires_at: float = None):
+        if expires_at is None and self.ttl:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+class TieredCache:
+    """MemoryCache in front of a DiskCache, sharing one TTL.
+
+    Disk entries carry their own expiry so a restart does not resurrect
+    stale values; disk hits are promoted to the memory tier.
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int, ttl: float = None):
+        self.ttl = ttl
+        self.memory = MemoryCache(max_entries, ttl)
+        self.disk = DiskCache(directory, max_bytes)
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        entry = self.disk.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] is not None and entry["expires_at"] < time.time():
+            self.disk.delete(key)
+            return None
+
+        self.memory.set(key, entry["value"], entry["expires_at"])
+        return entry["value"]
+
+    def set(self, key: str, value):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        self.memory.set(key, value, expires_at)
+        self.disk.set(key, {"expires_at": expires_at, "value": value})
+
+    def stats(self) -> dict:
+        return {"memory": self.memory.stats(), "disk": self.disk.stats()}
@@ -0,0 +1,101 @@
+import logging
+import os
+import threading
+from functools import lru_cache
+from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+FONT_DIRS = [
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    "~/.fonts",
+    "~/.local/share/fonts",
+    "/System/Library/Fonts",
+    "/Library/Fonts",
+    "C:/Windows/Fonts",
+]
+
+# (file name, face index inside a .ttc collection), in order of preference
+PREFERRED_FONTS = {
+    False: [("Helvetica.ttc", 0), ("DejaVuSans.ttf", 0), ("LiberationSans-Regular.ttf", 0),
+            ("Arial.ttf", 0), ("arial.ttf", 0), ("NotoSans-Regular.ttf", 0)],
+    True: [("Helvetica.ttc", 1), ("DejaVuSans-Bold.ttf", 0), ("LiberationSans-Bold.ttf", 0),
+           ("Arial Bold.ttf", 0), ("arialbd.ttf", 0), ("NotoSans-Bold.ttf", 0)],
+}
+
+
+class FontRegistry:
+    """Finds the report fonts once per process and hands out cached instances.
+
+    REPORT_FONT_PATH / REPORT_BOLD_FONT_PATH pin specific files;
+    REPORT_FONT_DIRS (os.pathsep separated) is searched before the system
+    font directories. When nothing is found, Pillow's bundled scalable font
+    is used instead of the fixed-size bitmap default.
+    """
+
+    def __init__(self, font_path: str = None, bold_font_path: str = None, search_dirs: list = None):
+        self.font_path = font_path or os.getenv("REPORT_FONT_PATH")
+        self.bold_font_path = bold_font_path or os.getenv("REPORT_BOLD_FONT_PATH")
+        extra_dirs = [d for d in os.getenv("REPORT_FONT_DIRS", "").split(os.pathsep) if d]
+        self.search_dirs = search_dirs or extra_dirs + FONT_DIRS
+        self._faces = {}
+        self._discovered = False
+        self._lock = threading.Lock()
+
+    def get(self, size: int = 20, bold: bool = False):
+        path, index = self.resolve(bold)
+        return _load_font(path, size, index)
+
+    def resolve(self, bold: bool = False):
+        """Returns (path, face index) for the weight, or (None, 0) for the bundled font."""
+        pinned = self.bold_font_path if bold else self.font_path
+        if pinned and os.path.exists(pinned):
+            return pinned, 0
+
+        self._discover()
+        for name, index in PREFERRED_FONTS[bold]:
+            if name.lower() in self._faces:
+                return self._faces[name.lower()], index
+        if bold:
+            return self.resolve(False)
+        return None, 0
+
+    def _discover(self):
+        with self._lock:
+            if self._discovered:
+                return
+            wanted = {name.lower() for fonts in PREFERRED_FONTS.values() for name, _ in fonts}
+            for directory in self.search_dirs:
+                directory = os.path.expanduser(directory)
+                if not os.path.isdir(directory):
+                    continue
+                for root, _, files in os.walk(directory):
+                    for name in files:
+                        if name.lower() in wanted and name.lower() not in self._faces:
+                            self._faces[name.lower()] = os.path.join(root, name)
+            self._discovered = True
+            logger.info(f"Fonts discovered: {', '.join(sorted(self._faces)) or 'none, using bundled font'}")
+
+
+@lru_cache(maxsize=64)
+def _load_font(path, size: int, index: int):
+    if path:
+        try:
+            return ImageFont.truetype(path, size, index=index)
+        except OSError as e:
+            logger.warning(f"Could not load font {path}: {e}")
+    return ImageFont.load_default(size)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_font(size: int = 20, bold: bool = False):
+    """Process-wide cached font lookup shared by every report render."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = FontRegistry()
+    return _registry.get(size, bold)
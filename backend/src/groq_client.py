@@ -0,0 +1,240 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import re
+import threading
+import time
+import httpx
+from groq import AsyncGroq, APIConnectionError, InternalServerError, RateLimitError
+from src.metrics import LLM_TOKENS, STAGE_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class GroqServiceError(Exception):
+    """A Groq request failed for good (non-retryable error or retries exhausted)."""
+
+
+async def _in_context(coro, context):
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def failed_generation(error: GroqServiceError):
+    """Returns the text Groq rejected in JSON mode (json_validate_failed), or None for other failures."""
+    body = getattr(error.__cause__, "body", None)
+    details = body.get("error", body) if isinstance(body, dict) else None
+    if isinstance(details, dict) and details.get("code") == "json_validate_failed":
+        return details.get("failed_generation")
+    return None
+
+
+def parse_reset(value) -> float:
+    """Parses Groq reset headers such as '7.66s', '2m59.56s' or '250ms' into seconds."""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in _DURATION_PART.findall(value))
+
+
+class _Budget:
+    def __init__(self):
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.paused_until = 0.0
+
+
+class RateLimitScheduler:
+    """Holds requests back until the per-model budget allows them.
+
+    Budgets come from the x-ratelimit-* headers of the previous response and
+    are decremented optimistically as requests are sent, so concurrent
+    callers spread themselves over the window instead of all getting a 429.
+    """
+
+    def __init__(self):
+        self._budgets = {}
+
+    def _budget(self, bucket: str) -> _Budget:
+        return self._budgets.setdefault(bucket, _Budget())
+
+    async def acquire(self, bucket: str, tokens: int = 0):
+        budget = self._budget(bucket)
+        while True:
+            now = time.monotonic()
+            wait = budget.paused_until - now
+            if budget.remaining_requests is not None and budget.remaining_requests <= 0:
+                wait = max(wait, budget.requests_reset_at - now)
+            if tokens and budget.remaining_tokens is not None and budget.remaining_tokens < tokens:
+                wait = max(wait, budget.tokens_reset_at - now)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+
+        if budget.remaining_requests is not None:
+            budget.remaining_requests -= 1
+        if tokens and budget.remaining_tokens is not None:
+            budget.remaining_tokens -= tokens
+
+    def update(self, bucket: str, headers):
+        budget = self._budget(bucket)
+        now = time.monotonic()
+        if "x-ratelimit-remaining-requests" in headers:
+            budget.remaining_requests = int(headers["x-ratelimit-remaining-requests"])
+            budget.requests_reset_at = now + parse_reset(headers.get("x-ratelimit-reset-requests"))
+        if "x-ratelimit-remaining-tokens" in headers:
+            budget.remaining_tokens = int(headers["x-ratelimit-remaining-tokens"])
+            budget.tokens_reset_at = now + parse_reset(headers.get("x-ratelimit-reset-tokens"))
+
+    def pause(self, bucket: str, seconds: float):
+        budget = self._budget(bucket)
+        budget.paused_until = max(budget.paused_until, time.monotonic() + seconds)
+
+
+class GroqGateway:
+    """Single AsyncGroq client shared by transcription and analysis.
+
+    The client and its pooled HTTP connections live on a dedicated event loop
+    thread; async callers await the coroutines there, and the synchronous
+    pipeline workers submit them with `run()`.
+    """
+
+    def __init__(self, api_key: str, max_connections: int = 20, max_retries: int = 5, timeout: float = 300.0):
+        self.max_retries = max_retries
+        self.scheduler = RateLimitScheduler()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="groq-gateway", daemon=True)
+        self._thread.start()
+
+        async def create_client():
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=timeout,
+            )
+            # Retries are done here, where the scheduler can see them
+            return AsyncGroq(api_key=api_key, max_retries=0, http_client=http_client)
+
+        self.client = self.run(create_client())
+
+    def run(self, coro):
+        """Runs a coroutine on the gateway loop and blocks until it finishes."""
+        # Carry the caller's context over, so the job's log fields follow its requests
+        context = contextvars.copy_context()
+        return asyncio.run_coroutine_threadsafe(_in_context(coro, context), self._loop).result()
+
+    async def transcribe(self, file, model: str, **params) -> str:
+        with timed("whisper_request"):
+            transcription = await self._request(
+                model, 0, lambda: self.client.audio.transcriptions.with_raw_response.create(
+                    file=file, model=model, **params
+                )
+            )
+        return transcription if isinstance(transcription, str) else transcription.text
+
+    async def chat(self, prompt: str, model: str, max_tokens: int, estimated_tokens: int = 0, on_token=None, **params):
+        """Returns (content, total_tokens) of a single-message chat completion.
+
+        With `on_token` the completion is streamed and the callback receives
+        each piece of text as it arrives (on the gateway thread).
+        """
+        with timed("llm_request"):
+            start = time.perf_counter()
+            completion = await self._request(
+                model, estimated_tokens + max_tokens, lambda: self.client.chat.completions.with_raw_response.create(
+                    messages=[{"role": "user", "content": prompt}], model=model, max_tokens=max_tokens,
+                    stream=on_token is not None, **params
+                )
+            )
+            if on_token is None:
+                content, total_tokens = completion.choices[0].message.content, completion.usage.total_tokens
+            else:
+                content, total_tokens = await self._read_stream(completion, model, on_token, start)
+        LLM_TOKENS.inc(total_tokens, model=model)
+        return content, total_tokens
+
+    async def _read_stream(self, stream, model: str, on_token, start: float):
+        parts = []
+        usage = None
+        try:
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    if not parts:
+                        STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_first_token")
+                    parts.append(text)
+                    on_token(text)
+                # Groq sends the usage in the last chunk
+                usage = (chunk.x_groq.usage if chunk.x_groq else None) or chunk.usage or usage
+        except Exception as e:
+            # Retrying here would repeat the tokens already delivered
+            raise GroqServiceError(f"{model}: stream interrupted: {e}") from e
+        return "".join(parts), usage.total_tokens if usage else 0
+
+    async def _request(self, bucket: str, tokens: int, send):
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.acquire(bucket, tokens)
+            try:
+                raw = await send()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise GroqServiceError(f"{bucket}: {type(e).__name__} after {attempt + 1} attempts: {e}") from e
+
+                response = getattr(e, "response", None)
+                if response is not None:
+                    self.scheduler.update(bucket, response.headers)
+                delay = self._backoff(attempt, response)
+                logger.warning(f"{bucket}: {type(e).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})...")
+                if isinstance(e, RateLimitError):
+                    # Hold every caller of this model, not only the one that got the 429
+                    self.scheduler.pause(bucket, delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            except Exception as e:
+                raise GroqServiceError(f"{bucket}: {e}") from e
+
+            self.scheduler.update(bucket, raw.headers)
+            return await raw.parse()
+
+    def _backoff(self, attempt: int, response) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            return parse_reset(retry_after) + random.uniform(0, 1)
+        # Full jitter: spreads retries of concurrent callers over the window
+        return random.uniform(0.5, min(2 ** (attempt + 1), 60))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_gateway() -> GroqGateway:
+    """Returns the process-wide gateway, creating it on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            api_key = os.getenv("GROQ_API_KEY")
+            if not api_key:
+                raise ValueError(
+                    "GROQ_API_KEY not found. "
+                    "Please add your API key to the .env file. "
+                    "Get one free at: https://console.groq.com"
+                )
+            _shared = GroqGateway(
+                api_key,
+                max_connections=int(os.getenv("GROQ_MAX_CONNECTIONS", "20")),
+                max_retries=int(os.getenv("GROQ_MAX_RETRIES", "5")),
+            )
+        return _shared
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from src.log import log_context, update_log_context
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # (event, data) in emission order; an event's id is its position + 1
+        self.events = []
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def update(self, stage: str, progress: float = None):
+        with self._lock:
+            self.stage = stage
+            if progress is not None:
+                self.progress = max(self.progress, min(progress, 1.0))
+            self.updated_at = time.time()
+            update_log_context(stage=stage)
+            self._emit("stage", {"stage": self.stage, "progress": round(self.progress, 3)})
+
+    def emit(self, event: str, data=None):
+        """Publishes a partial result (transcript chunk, LLM token...) to the job's listeners."""
+        with self._lock:
+            self._emit(event, data)
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+            self.updated_at = time.time()
+
+    def finish(self, result: dict):
+        with self._lock:
+            self.status = "success"
+            self.stage = "done"
+            self.progress = 1.0
+            self.result = result
+            self.updated_at = time.time()
+            self._emit("result", result)
+
+    def fail(self, message: str):
+        with self._lock:
+            self.status = "error"
+            self.error = message
+            self.updated_at = time.time()
+            self._emit("error", {"message": message})
+
+    def _emit(self, event: str, data):
+        # Called with the lock held; listeners only get a wake-up and read self.events themselves
+        self.events.append((event, data))
+        for loop, wakeup in self._subscribers:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # the listener's loop is closed
+
+    async def listen(self, after: int = 0, heartbeat: float = 15.0):
+        """Yields (id, event, data) for every event after `after` until the job finishes,
+        and None when nothing happened for `heartbeat` seconds."""
+        wakeup = asyncio.Event()
+        subscriber = (asyncio.get_running_loop(), wakeup)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        try:
+            while True:
+                wakeup.clear()
+                with self._lock:
+                    pending = self.events[after:]
+                    finished = self.finished
+                for event, data in pending:
+                    after += 1
+                    yield after, event, data
+                if finished:
+                    return
+                try:
+                    await asyncio.wait_for(wakeup.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+    @property
+    def has_listeners(self) -> bool:
+        with self._lock:
+            return bool(self._subscribers)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("success", "error")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": round(self.progress, 3),
+                "elapsed": round(self.updated_at - self.created_at, 1),
+            }
+            if self.status == "success":
+                data.update(self.result)
+            elif self.status == "error":
+                data["message"] = self.error
+            return data
+
+
+class JobManager:
+    """Runs long pipeline tasks on a bounded worker pool, off the event loop."""
+
+    def __init__(self, max_workers: int = 2, max_finished: int = 200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_finished = max_finished
+
+    def submit(self, fn, *args, **kwargs) -> Job:
+        job = Job()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        with log_context(job_id=job.id, stage=job.stage):
+            job.start()
+            try:
+                job.finish(fn(job, *args, **kwargs))
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed: {e}")
+                job.fail(str(e))
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        """Cancels the queued jobs and stops accepting new ones; running jobs are not waited for."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            queued = [job for job in self._jobs.values() if job.status == "queued"]
+        # Their futures were cancelled: fail them so pollers and SSE listeners stop waiting
+        for job in queued:
+            job.fail("El servidor se detuvo antes de iniciar el análisis")
@@ -0,0 +1,114 @@
+import atexit
+import copy
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from contextlib import contextmanager
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_context = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """Adds `fields` (job_id, stage...) to every record logged inside the block by this thread or task."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def update_log_context(**fields):
+    """Changes fields of the enclosing log_context (e.g. the stage of a running job)."""
+    _context.set({**_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; values passed with `extra=` become fields."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable line with `extra=` fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def formatMessage(self, record):
+        # Fields go on the message line, before any traceback
+        line = super().formatMessage(record)
+        fields = {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRS}
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Keeps the traceback apart from the message (the stock handler merges them),
+    so the JSON formatter can still emit it as its own field."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+
+
+def configure_logging(level: str = None, fmt: str = None):
+    """Sends every log record through a queue to a background writer thread,
+    so request handlers and pipeline workers never block on stderr.
+
+    LOG_LEVEL sets the level (INFO by default); LOG_FORMAT=json switches to
+    one JSON object per line.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else KeyValueFormatter())
+
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    # The filter runs in the logging thread, where the context is visible, before the record is queued
+    queue_handler = _QueueHandler(records)
+    queue_handler.addFilter(ContextFilter())
+    root.handlers = [queue_handler]
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
@@ -0,0 +1,122 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from PIL import Image, ImageDraw
+from src.cache import MemoryCache, atomic_write
+
+LOGO_SIZE = 120
+
+
+class LogoAsset:
+    """Everything a report needs from a logo, computed once per image content."""
+
+    def __init__(self, logo_id: str, color: tuple, image):
+        self.id = logo_id
+        self.color = color
+        self.image = image
+
+    def to_dict(self) -> dict:
+        return {"logo_id": self.id, "color": "#%02x%02x%02x" % self.color}
+
+
+class LogoRegistry:
+    """Content-addressed store of processed institution logos.
+
+    Registering a logo decodes it once, finds its dominant color and builds
+    the circular 120px RGBA asset; both are written to LOGO_DIR under the
+    sha256 of the uploaded bytes, so the id stays valid across restarts and
+    is shared with the batch worker processes.
+    """
+
+    def __init__(self, directory: str = None, max_entries: int = 64):
+        self.directory = directory or os.getenv("LOGO_DIR", "cache/logos")
+        self.assets = MemoryCache(max_entries)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def register(self, data: bytes) -> LogoAsset:
+        """Processes the logo unless the same bytes were registered before; raises ValueError if it is not an image."""
+        logo_id = hashlib.sha256(data).hexdigest()[:32]
+        asset = self.get(logo_id)
+        if asset is not None:
+            return asset
+
+        try:
+            logo = Image.open(io.BytesIO(data))
+            logo.load()
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError(f"Invalid logo image: {e}")
+
+        asset = LogoAsset(logo_id, self._dominant_color(logo), self._circular_asset(logo))
+        self._store(asset)
+        self.assets.set(logo_id, asset)
+        return asset
+
+    def register_file(self, path: str) -> LogoAsset:
+        with open(path, "rb") as f:
+            return self.register(f.read())
+
+    def get(self, logo_id: str):
+        """Returns the asset for an id, or None if it was never registered."""
+        if not logo_id or not logo_id.isalnum():
+            return None
+        asset = self.assets.get(logo_id)
+        if asset is not None:
+            return asset
+
+        image_path, meta_path = self._paths(logo_id)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                color = tuple(json.load(f)["color"])
+            image = Image.open(image_path)
+            image.load()
+        except (OSError, ValueError, KeyError):
+            return None
+
+        asset = LogoAsset(logo_id, color, image)
+        self.assets.set(logo_id, asset)
+        return asset
+
+    def _dominant_color(self, logo) -> tuple:
+        # Most frequent exact color of a 100px thumbnail, counted in C by getcolors
+        thumb = logo.convert("RGB")
+        thumb.thumbnail((100, 100))
+        colors = thumb.getcolors(maxcolors=thumb.width * thumb.height)
+        return max(colors, key=lambda entry: entry[0])[1]
+
+    def _circular_asset(self, logo):
+        logo_img = logo.convert("RGBA")
+        logo_img.thumbnail((LOGO_SIZE, LOGO_SIZE), Image.Resampling.LANCZOS)
+
+        mask = Image.new("L", (LOGO_SIZE, LOGO_SIZE), 0)
+        ImageDraw.Draw(mask).ellipse([0, 0, LOGO_SIZE, LOGO_SIZE], fill=255)
+
+        output = Image.new("RGBA", (LOGO_SIZE, LOGO_SIZE), (0, 0, 0, 0))
+        output.paste(logo_img.resize((LOGO_SIZE, LOGO_SIZE)), (0, 0))
+        output.putalpha(mask)
+        return output
+
+    def _paths(self, logo_id: str):
+        base = os.path.join(self.directory, logo_id)
+        return f"{base}.png", f"{base}.json"
+
+    def _store(self, asset: LogoAsset):
+        image_path, meta_path = self._paths(asset.id)
+        with self._lock:
+            atomic_write(image_path, lambda f: asset.image.save(f, "PNG"))
+            atomic_write(meta_path, lambda f: json.dump({"color": list(asset.color)}, f), "w")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_logo_registry() -> LogoRegistry:
+    """Process-wide logo registry, created on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LogoRegistry()
+    return _registry
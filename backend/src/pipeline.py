@@ -0,0 +1,93 @@
+import logging
+import os
+import wave
+from src.audio_extractor import AudioExtractor
+from src.metrics import AUDIO_SECONDS, TRANSCRIPT_TOKENS, timed
+from src.silence import SilenceTrimmer
+from src.transcript_compactor import TranscriptCompactor
+
+logger = logging.getLogger(__name__)
+
+
+class ClassAnalysisPipeline:
+    """Extract → transcribe → compact → analyze, reporting progress through a callback."""
+
+    def __init__(self, transcriber, analyzer):
+        self.transcriber = transcriber
+        self.analyzer = analyzer
+        self.extractor = AudioExtractor()
+        self.trimmer = SilenceTrimmer() if os.getenv("SILENCE_TRIM", "1") == "1" else None
+        self.compactor = TranscriptCompactor() if os.getenv("TRANSCRIPT_COMPACTION", "1") == "1" else None
+
+    def run(self, source, workdir: str, extension: str = "", progress=None, regenerate: bool = False,
+            emit=None, has_listeners=None) -> dict:
+        progress = progress or (lambda stage, fraction=None: None)
+        # Partial results (transcript chunks, analysis tokens) for streaming clients
+        emit = emit or (lambda event, data=None: None)
+        has_listeners = has_listeners or (lambda: False)
+
+        # 1. Extraer audio: el upload se envía directo a ffmpeg por stdin
+        progress("extracting", 0.05)
+        with timed("extract"):
+            audio_path = self.extractor.extract(source, os.path.join(workdir, "audio.wav"), workdir, extension)
+
+        # 2. Detectar pausas y recortar silencios largos antes de subir el audio
+        progress("detecting_silence", 0.15)
+        with timed("silence_detection"):
+            timeline = self._trim_silence(audio_path, workdir)
+        if timeline:
+            AUDIO_SECONDS.inc(timeline.removed_seconds, kind="silence_removed")
+
+        # 3. Transcribir (Whisper)
+        progress("transcribing", 0.2)
+        logger.info("Transcribiendo video...")
+        with timed("transcribe"):
+            transcript = self.transcriber.transcribe(
+                timeline.path if timeline else audio_path,
+                timeline=timeline,
+                on_chunk=lambda chunk: emit("chunk", chunk),
+            )
+        emit("transcript", {"text": transcript})
+
+        # 4. Compactar: sin alucinaciones de Whisper, muletillas ni repeticiones, el prompt es más corto
+        compact = self._compact(transcript)
+        analysis_input = compact.text if compact else transcript
+        if not analysis_input.strip():
+            raise ValueError("No se detectó habla en el video")
+
+        # 5. Analizar
+        progress("analyzing", 0.7)
+        logger.info("Analizando clase...")
+        # El análisis solo se transmite token a token si hay un cliente escuchando;
+        # sin streaming el modelo responde en modo JSON
+        on_token = (lambda text: emit("token", {"text": text})) if has_listeners() else None
+        with timed("analyze"):
+            analysis = self.analyzer.analyze_class(analysis_input, regenerate=regenerate, on_token=on_token)
+
+        result = {
+            "transcript": transcript,
+            "report": analysis
+        }
+        if timeline:
+            result["audio"] = timeline.to_dict()
+        if compact:
+            result["compaction"] = compact.to_dict()
+        return result
+
+    def _compact(self, transcript: str):
+        if not self.compactor:
+            return None
+        with timed("compact"):
+            compact = self.compactor.compact(transcript)
+        TRANSCRIPT_TOKENS.inc(compact.tokens_before, kind="raw")
+        TRANSCRIPT_TOKENS.inc(compact.tokens_after, kind="compacted")
+        return compact
+
+    def _trim_silence(self, audio_path: str, workdir: str):
+        if not self.trimmer:
+            return None
+        try:
+            return self.trimmer.process(audio_path, os.path.join(workdir, "speech.wav"))
+        except (ValueError, EOFError, wave.Error) as e:
+            logger.warning(f"Análisis de silencios omitido: {e}")
+            return None
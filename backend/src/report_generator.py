@@ -1,18 +1,63 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageOps
 from datetime import datetime
-from collections import Counter
+import hashlib
+import json
 import locale
+import logging
+import math
 import os
 import random
+import numpy as np
+from functools import lru_cache
+from src.cache import MemoryCache
+from src.fonts import get_font
+from src.image_encoder import ImageEncoder
+from src.logo_registry import get_logo_registry
+from src.metrics import BYTES, record_cache, timed
+from src.report_store import ReportStore
+from src.text_layout import ReportLayout
+
+logger = logging.getLogger(__name__)
+
+GRADIENT_BUCKET = 64
+PHOTO_BOX = (800, 225)
+# EXIF orientations that rotate the stored image by 90 or 270 degrees
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+TEMPLATE_HEIGHT_STEP = 64
+# Bump whenever the drawing code changes, so cached reports are not reused
+TEMPLATE_VERSION = "1"
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=32)
+def _gradient_column(height, border_color):
+    """1px-wide side-bar gradient: full color at the center, 30% darker at the edges."""
+    alpha = np.abs(np.arange(height) - height // 2) / (height // 2)
+    column = np.outer(1 - alpha * 0.3, np.array(border_color, dtype=np.float64)).astype(np.uint8)
+    return Image.fromarray(column.reshape(height, 1, 3), 'RGB')
+
 
 class ReportGenerator:
-    def __init__(self):
+    def __init__(self, logos=None, store=None):
         self.width = 1920
         self.bg_red = (220, 38, 38)
         self.card_white = (255, 255, 255)
         self.text_red = (220, 38, 38)
         self.text_dark = (31, 41, 55)
         self.text_light = (107, 114, 128)
+        self.encoder = ImageEncoder()
+        self.logos = logos or get_logo_registry()
+        self.store = store or ReportStore()
+        self.templates = MemoryCache(int(os.getenv("REPORT_TEMPLATE_CACHE_SIZE", "8")))
+        self.rendered = MemoryCache(int(os.getenv("REPORT_CACHE_SIZE", "64")))
+        self.max_photo_pixels = int(os.getenv("REPORT_MAX_PHOTO_PIXELS", "50000000"))
         
         try:
             locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
@@ -31,39 +76,109 @@ class ReportGenerator:
         total_sessions: int = 8,
         student_name: str = "",
         teacher_name: str = "",
-        session_date: str = None
+        session_date: str = None,
+        output_format: str = None,
+        logo_id: str = None
     ) -> str:
-        border_color = self._extract_logo_color(logo_path)
+        encoder = ImageEncoder(output_format) if output_format else self.encoder
+        data = self.encode_report(analysis, session_photo_path, logo_path, session_number, total_sessions,
+                                  student_name, teacher_name, session_date, logo_id, encoder)
+        return self._save_report(data, encoder)
+    
+    def encode_report(
+        self, 
+        analysis: dict, 
+        session_photo_path: str = None,
+        logo_path: str = None,
+        session_number: int = 1,
+        total_sessions: int = 8,
+        student_name: str = "",
+        teacher_name: str = "",
+        session_date: str = None,
+        logo_id: str = None,
+        encoder: ImageEncoder = None
+    ) -> bytes:
+        """Renders and encodes the report; identical inputs are served from the cache"""
+        encoder = encoder or self.encoder
+        logo = self._resolve_logo(logo_path, logo_id)
+        key = self._report_key(analysis, session_photo_path, logo, session_number, total_sessions,
+                               student_name, teacher_name, session_date, encoder)
+        
+        data = self.rendered.get(key)
+        record_cache("reports", data is not None)
+        if data is None:
+            with timed("render"):
+                img = self.render(analysis, session_photo_path, None, session_number, total_sessions,
+                                  student_name, teacher_name, session_date, logo.id if logo else None)
+            with timed("encode_image"):
+                data = encoder.to_bytes(img)
+            BYTES.inc(len(data), kind="report")
+            self.rendered.set(key, data)
+        return data
+    
+    def _report_key(self, analysis, session_photo_path, logo, session_number, total_sessions,
+                    student_name, teacher_name, session_date, encoder):
+        has_photo = bool(session_photo_path and os.path.exists(session_photo_path))
+        fields = {
+            'analysis': analysis,
+            'photo': _file_digest(session_photo_path) if has_photo else None,
+            'logo': logo.id if logo else None,
+            'session': [session_number, total_sessions, student_name, teacher_name],
+            # The resolved date, since a missing session_date means "today"
+            'date': self._format_date(session_date),
+            'year': datetime.now().year,
+            'template': TEMPLATE_VERSION,
+            'encoding': [encoder.output_format, encoder.options()],
+        }
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def render(
+        self, 
+        analysis: dict, 
+        session_photo_path: str = None,
+        logo_path: str = None,
+        session_number: int = 1,
+        total_sessions: int = 8,
+        student_name: str = "",
+        teacher_name: str = "",
+        session_date: str = None,
+        logo_id: str = None
+    ) -> Image.Image:
+        """Draws the report and returns the image without writing it to disk"""
+        logo = self._resolve_logo(logo_path, logo_id)
+        border_color = logo.color if logo else self.bg_red
         font_set = self._create_fonts()
-        dimensions = self._calculate_dimensions(analysis, session_photo_path, font_set)
+        layout = ReportLayout(analysis, font_set['body'], self._column_width())
+        dimensions = self._calculate_dimensions(layout, session_photo_path)
+        card_coords = self._calculate_card_coords(dimensions['height'])
+        
+        photo = self._load_session_photo(session_photo_path)
+        content_y = self._calculate_content_y(card_coords, session_photo_path, photo)
         
-        img = self._create_base_image(dimensions['height'], border_color)
+        img = self._get_template(dimensions['height'], border_color, logo, content_y, font_set)
         draw = ImageDraw.Draw(img)
         
-        card_coords = self._calculate_card_coords(dimensions['height'])
-        self._draw_card(draw, card_coords)
         self._draw_header(draw, card_coords, session_number, total_sessions, session_date, font_set)
-        
-        if logo_path and os.path.exists(logo_path):
-            self._draw_logo(img, card_coords, logo_path)
-        
-        photo_y = self._draw_session_photo(img, draw, card_coords, session_photo_path, student_name, teacher_name, font_set)
-        content_y = photo_y + 60 if session_photo_path and os.path.exists(session_photo_path) else card_coords['y1'] + 170
+        self._draw_session_photo(img, draw, card_coords, photo, student_name, teacher_name, font_set)
         
         col_margin = 100
-        col_width = (card_coords['x2'] - card_coords['x1'] - 3 * col_margin) // 2
+        col_width = self._column_width()
         
-        max_y = self._draw_content_sections(draw, card_coords, content_y, col_margin, col_width, analysis, font_set)
-        self._draw_bottom_sections(draw, card_coords, max_y, col_margin, col_width, analysis, font_set)
-        self._draw_footer(draw, card_coords, font_set)
+        max_y = self._draw_content_sections(draw, card_coords, content_y, col_margin, col_width, layout, font_set)
+        self._draw_bottom_sections(draw, card_coords, max_y, col_margin, col_width, layout, font_set)
         
-        return self._save_report(img)
+        return img
     
     def _get_safe_font(self, size=20, bold=False):
-        try:
-            return ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", size)
-        except Exception:
-            return ImageFont.load_default()
+        return get_font(size, bold)
+    
+    def _fit_font(self, text, font, size, bold, max_width):
+        # Fonts found on Linux (e.g. DejaVu) run wider than Helvetica
+        while size > 20 and font.getlength(text) > max_width:
+            size -= 4
+            font = self._get_safe_font(size, bold)
+        return font
     
     def _create_fonts(self):
         return {
@@ -74,79 +189,81 @@ class ReportGenerator:
             'small': self._get_safe_font(18)
         }
     
-    def _calculate_dimensions(self, analysis, session_photo_path, fonts):
+    def _get_template(self, height, border_color, logo, content_y, fonts):
+        """Returns a copy of the static layers (background, card, banner, logo,
+        top headings, footer), rendered once per branding and layout."""
+        key = (height, tuple(border_color), logo.id if logo else None, content_y, datetime.now().year)
+        
+        template = self.templates.get(key)
+        record_cache("report_templates", template is not None)
+        if template is None:
+            # Seeded from the key: the same branding and layout always get the same background
+            seed = int.from_bytes(hashlib.sha256(repr(key).encode('utf-8')).digest()[:8], 'big')
+            template = self._create_base_image(height, border_color, random.Random(seed))
+            draw = ImageDraw.Draw(template)
+            
+            card_coords = self._calculate_card_coords(height)
+            self._draw_card(draw, card_coords)
+            self._draw_banner(draw, card_coords)
+            if logo:
+                self._draw_logo(template, card_coords, logo)
+            self._draw_section_titles(draw, card_coords, content_y, fonts)
+            self._draw_footer(draw, card_coords, fonts)
+            
+            self.templates.set(key, template)
+        return template.copy()
+    
+    def _column_width(self):
         card_margin = 80
         col_margin = 100
-        col_width = (self.width - 2 * card_margin - 3 * col_margin) // 2
+        return (self.width - 2 * card_margin - 3 * col_margin) // 2
+    
+    def _calculate_dimensions(self, layout, session_photo_path):
+        card_margin = 80
         
         header_space = 170
         photo_space = 225 + 60 if session_photo_path and os.path.exists(session_photo_path) else 0
         
-        obj_space = self._calculate_section_space(analysis.get('objetivos', []), fonts['body'], col_width, 3)
-        dev_bullets = analysis.get('desarrollo', '').split('.')[:4]
-        dev_space = self._calculate_section_space(dev_bullets, fonts['body'], col_width, 4, is_sentences=True)
-        
-        rec_lines = self._wrap_text(analysis.get('recomendaciones', ''), fonts['body'], col_width)
-        rec_space = 50 + (min(len(rec_lines), 8) * 30)
-        
-        act_lines = self._wrap_text(analysis.get('actitud', ''), fonts['body'], col_width)
-        act_space = 50 + (min(len(act_lines), 8) * 30)
-        
-        content_space = max(obj_space, dev_space)
-        bottom_space = max(rec_space, act_space)
-        total_height = header_space + photo_space + content_space + 60 + bottom_space + 100
+        total_height = header_space + photo_space + layout.content_space + 60 + layout.bottom_space + 100
         
         calculated_height = max(1080, total_height + 2 * card_margin + 100)
+        # Round up so reports of similar length share a cached template
+        calculated_height = 1080 + -(-(calculated_height - 1080) // TEMPLATE_HEIGHT_STEP) * TEMPLATE_HEIGHT_STEP
         
         return {'height': calculated_height}
     
-    def _calculate_section_space(self, items, font, max_width, max_items, is_sentences=False):
-        if isinstance(items, str):
-            items = [items]
-        
-        lines_count = 0
-        for item in items[:max_items]:
-            if is_sentences and not item.strip():
-                continue
-            prefix = f"• {item.strip()}." if is_sentences else f"• {item}"
-            lines = self._wrap_text(prefix, font, max_width)
-            lines_count += min(len(lines), 2)
-        
-        return 50 + (lines_count * 30) + (len(items[:max_items]) * 5)
-    
-    def _extract_logo_color(self, logo_path):
+    def _resolve_logo(self, logo_path, logo_id):
+        if logo_id:
+            return self.logos.get(logo_id)
         if not logo_path or not os.path.exists(logo_path):
-            return self.bg_red
+            return None
         try:
-            logo = Image.open(logo_path).convert('RGB')
-            logo.thumbnail((100, 100))
-            pixels = list(logo.getdata())
-            return Counter(pixels).most_common(1)[0][0]
-        except Exception:
-            return self.bg_red
+            return self.logos.register_file(logo_path)
+        except Exception as e:
+            logger.warning(f"Error loading logo: {e}")
+            return None
     
-    def _create_base_image(self, height, border_color):
+    def _create_base_image(self, height, border_color, rng):
         img = Image.new('RGB', (self.width, height), border_color)
         draw = ImageDraw.Draw(img)
         
-        for i in range(height):
-            alpha = abs(i - height // 2) / (height // 2)
-            color = tuple(int(border_color[j] * (1 - alpha * 0.3)) for j in range(3))
-            draw.rectangle([0, i, 100, i + 1], fill=color)
-            draw.rectangle([self.width - 100, i, self.width, i + 1], fill=color)
+        bucket = -(-height // GRADIENT_BUCKET) * GRADIENT_BUCKET
+        strip = _gradient_column(bucket, tuple(border_color)).resize((101, height), Image.Resampling.BILINEAR)
+        img.paste(strip, (0, 0))
+        img.paste(strip.crop((0, 0, 100, height)), (self.width - 100, 0))
         
-        self._draw_math_background(draw, height)
+        self._draw_math_background(draw, height, rng)
         return img
     
-    def _draw_math_background(self, draw, height):
+    def _draw_math_background(self, draw, height, rng):
         font_math = self._get_safe_font(40)
         formulas = ["β", "∫", "+", "÷", "α", "π", "Σ", "∞", "√", "≠", "≤", "≥",
                    "x²", "y", "sin", "cos", "θ", "∂", "∆", "λ", "μ", "σ"]
         
         for _ in range(30):
-            formula = random.choice(formulas)
-            x = random.randint(50, self.width - 100)
-            y = random.randint(50, height - 100)
+            formula = rng.choice(formulas)
+            x = rng.randint(50, self.width - 100)
+            y = rng.randint(50, height - 100)
             draw.text((x, y), formula, font=font_math, fill=(255, 255, 255))
     
     def _calculate_card_coords(self, height):
@@ -172,13 +289,19 @@ class ReportGenerator:
         draw.ellipse([x1, y2 - radius * 2, x1 + radius * 2, y2], fill=fill, outline=outline, width=width)
         draw.ellipse([x2 - radius * 2, y2 - radius * 2, x2, y2], fill=fill, outline=outline, width=width)
     
+    def _banner_coords(self, coords):
+        return [coords['x1'] + 40, coords['y1'] + 20, coords['x1'] + 580, coords['y1'] + 120]
+    
+    def _draw_banner(self, draw, coords):
+        self._draw_rounded_rectangle(draw, self._banner_coords(coords), radius=15, fill=self.text_red)
+    
     def _draw_header(self, draw, coords, session_number, total_sessions, session_date, fonts):
-        banner_coords = [coords['x1'] + 40, coords['y1'] + 20, coords['x1'] + 580, coords['y1'] + 120]
-        self._draw_rounded_rectangle(draw, banner_coords, radius=15, fill=self.text_red)
+        banner_coords = self._banner_coords(coords)
         
         session_text = f"SESIÓN N° {session_number} DE {total_sessions}"
+        banner_font = self._fit_font(session_text, fonts['banner'], 56, True, banner_coords[2] - banner_coords[0] - 60)
         draw.text((coords['x1'] + 70, coords['y1'] + 55), session_text, 
-                 font=fonts['banner'], fill=(255, 255, 255))
+                 font=banner_font, fill=(255, 255, 255))
         
         date_str = self._format_date(session_date)
         draw.text((coords['x1'] + 630, coords['y1'] + 60), date_str, 
@@ -193,75 +316,81 @@ class ReportGenerator:
                 pass
         return datetime.now().strftime("%d de %B de %Y")
     
-    def _draw_logo(self, img, coords, logo_path):
+    def _draw_logo(self, img, coords, logo):
+        img.paste(logo.image, (coords['x2'] - 180, coords['y1'] + 20), logo.image)
+    
+    def _load_session_photo(self, photo_path):
+        if not photo_path or not os.path.exists(photo_path):
+            return None
         try:
-            logo_img = Image.open(logo_path).convert('RGBA')
-            logo_size = 120
-            logo_img.thumbnail((logo_size, logo_size), Image.Resampling.LANCZOS)
+            photo = Image.open(photo_path)
             
-            mask = Image.new('L', (logo_size, logo_size), 0)
-            ImageDraw.Draw(mask).ellipse([0, 0, logo_size, logo_size], fill=255)
+            # JPEGs decode straight at 1/2-1/8 scale; keep ~2x the size the photo is fitted to
+            # inside the box (not the box itself) so LANCZOS still has detail
+            box = PHOTO_BOX[::-1] if photo.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS else PHOTO_BOX
+            scale = min(box[0] / photo.width, box[1] / photo.height, 1.0)
+            photo.draft('RGB', (math.ceil(photo.width * scale * 2), math.ceil(photo.height * scale * 2)))
             
-            output = Image.new('RGBA', (logo_size, logo_size), (0, 0, 0, 0))
-            output.paste(logo_img.resize((logo_size, logo_size)), (0, 0))
-            output.putalpha(mask)
+            # Checked on the (possibly reduced) size, before any pixel is decoded
+            if photo.width * photo.height > self.max_photo_pixels:
+                logger.warning(f"Session photo too large ({photo.width}x{photo.height}), skipping it")
+                return None
             
-            img.paste(output, (coords['x2'] - 180, coords['y1'] + 20), output)
+            # In place: no extra full-size copy when the photo is already upright and RGB
+            ImageOps.exif_transpose(photo, in_place=True)
+            if photo.mode != 'RGB':
+                photo = photo.convert('RGB')
+            photo.thumbnail(PHOTO_BOX, Image.Resampling.LANCZOS)
+            return photo
         except Exception as e:
-            print(f"Error loading logo: {e}")
+            logger.warning(f"Error loading session photo: {e}")
+            return None
     
-    def _draw_session_photo(self, img, draw, coords, photo_path, student_name, teacher_name, fonts):
+    def _calculate_content_y(self, coords, photo_path, photo):
         photo_y = coords['y1'] + 170
-        
         if not photo_path or not os.path.exists(photo_path):
             return photo_y
+        if photo is None:
+            return photo_y + 60
+        return photo_y + photo.height + 10 + 60
+    
+    def _draw_session_photo(self, img, draw, coords, photo, student_name, teacher_name, fonts):
+        if photo is None:
+            return
         
-        try:
-            photo = Image.open(photo_path).convert('RGB')
-            photo.thumbnail((800, 225), Image.Resampling.LANCZOS)
-            
-            photo_x = (self.width - photo.width) // 2
-            img.paste(photo, (photo_x, photo_y))
-            
-            name_y = photo_y + photo.height + 10
-            draw.text((photo_x + 30, name_y), student_name, font=fonts['small'], fill=self.text_dark)
-            draw.text((photo_x + photo.width - 200, name_y), teacher_name, font=fonts['small'], fill=self.text_dark)
-            
-            return name_y
-        except Exception:
-            return photo_y
+        photo_y = coords['y1'] + 170
+        photo_x = (self.width - photo.width) // 2
+        img.paste(photo, (photo_x, photo_y))
+        
+        name_y = photo_y + photo.height + 10
+        draw.text((photo_x + 30, name_y), student_name, font=fonts['small'], fill=self.text_dark)
+        draw.text((photo_x + photo.width - 200, name_y), teacher_name, font=fonts['small'], fill=self.text_dark)
     
-    def _draw_content_sections(self, draw, coords, content_y, col_margin, col_width, analysis, fonts):
+    def _draw_section_titles(self, draw, coords, content_y, fonts):
+        col_margin = 100
+        section_y = content_y + 20
+        draw.text((coords['x1'] + col_margin, section_y), "Objetivos de la Sesión",
+                 font=fonts['heading'], fill=self.text_red)
+        draw.text((coords['x1'] + 2 * col_margin + self._column_width(), section_y), "Desarrollo de la Sesión",
+                 font=fonts['heading'], fill=self.text_red)
+    
+    def _draw_content_sections(self, draw, coords, content_y, col_margin, col_width, layout, fonts):
         obj_x = coords['x1'] + col_margin
         dev_x = coords['x1'] + 2 * col_margin + col_width
         section_y = content_y + 20
         
-        max_obj_y = self._draw_section(draw, obj_x, section_y, "Objetivos de la Sesión",
-                                       analysis.get('objetivos', []), col_width, fonts, max_items=3)
-        
-        dev_bullets = analysis.get('desarrollo', '').split('.')[:4]
-        max_dev_y = self._draw_section(draw, dev_x, section_y, "Desarrollo de la Sesión",
-                                       dev_bullets, col_width, fonts, max_items=4, is_sentences=True)
+        max_obj_y = self._draw_section(draw, obj_x, section_y, layout.objetivos, fonts)
+        max_dev_y = self._draw_section(draw, dev_x, section_y, layout.desarrollo, fonts)
         
         return max(max_obj_y, max_dev_y)
     
-    def _draw_section(self, draw, x, y, title, items, max_width, fonts, max_items=3, is_sentences=False):
-        draw.text((x, y), title, font=fonts['heading'], fill=self.text_red)
-        
-        if isinstance(items, str):
-            items = [items]
-        
+    def _draw_section(self, draw, x, y, block, fonts):
+        # The title is part of the cached template
         text_y = y + 50
         max_y = text_y
         
-        for item in items[:max_items]:
-            if is_sentences and not item.strip():
-                continue
-            
-            prefix = f"• {item.strip()}." if is_sentences else f"• {item}"
-            lines = self._wrap_text(prefix, fonts['body'], max_width)
-            
-            for line in lines[:2]:
+        for lines in block.items:
+            for line in lines:
                 draw.text((x, text_y), line, font=fonts['body'], fill=self.text_dark)
                 text_y += 30
                 max_y = max(max_y, text_y)
@@ -269,25 +398,24 @@ class ReportGenerator:
         
         return max_y
     
-    def _draw_bottom_sections(self, draw, coords, max_y, col_margin, col_width, analysis, fonts):
+    def _draw_bottom_sections(self, draw, coords, max_y, col_margin, col_width, layout, fonts):
         bottom_y = max_y + 60
         
         obj_x = coords['x1'] + col_margin
         dev_x = coords['x1'] + 2 * col_margin + col_width
         
         self._draw_text_section(draw, obj_x, bottom_y, "Recomendación y Próximos Pasos",
-                               analysis.get('recomendaciones', ''), col_width, fonts, coords['y2'])
+                               layout.recomendaciones, fonts, coords['y2'])
         
         self._draw_text_section(draw, dev_x, bottom_y, "Actitud en Clase",
-                               analysis.get('actitud', ''), col_width, fonts, coords['y2'])
+                               layout.actitud, fonts, coords['y2'])
     
-    def _draw_text_section(self, draw, x, y, title, text, max_width, fonts, max_y):
+    def _draw_text_section(self, draw, x, y, title, block, fonts, max_y):
         draw.text((x, y), title, font=fonts['heading'], fill=self.text_red)
         
-        lines = self._wrap_text(text, fonts['body'], max_width)
         text_y = y + 50
         
-        for line in lines[:8]:
+        for line in block.lines:
             if text_y + 30 < max_y - 80:
                 draw.text((x, text_y), line, font=fonts['body'], fill=self.text_dark)
                 text_y += 30
@@ -301,26 +429,6 @@ class ReportGenerator:
                  f"© {datetime.now().year} More Academy", 
                  font=fonts['small'], fill=self.text_light)
     
-    def _wrap_text(self, text, font, max_width):
-        lines = []
-        for paragraph in text.split('\n'):
-            words = paragraph.split()
-            current_line = []
-            for word in words:
-                test_line = ' '.join(current_line + [word])
-                bbox = font.getbbox(test_line)
-                if bbox[2] - bbox[0] <= max_width:
-                    current_line.append(word)
-                else:
-                    if current_line:
-                        lines.append(' '.join(current_line))
-                    current_line = [word]
-            if current_line:
-                lines.append(' '.join(current_line))
-        return lines
-    
-    def _save_report(self, img):
-        output_path = f"reports/report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        os.makedirs("reports", exist_ok=True)
-        img.save(output_path, 'PNG', quality=95)
-        return output_path
+    def _save_report(self, data, encoder):
+        filename = self.store.save(data, encoder.extension)
+        return os.path.join(self.store.directory, filename)
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from src.cache import atomic_write, evict_oldest, scan_entries
+
+_FILENAME = re.compile(r"^[0-9a-f]{32}\.[a-z]{3,4}$")
+
+
+class ReportStore:
+    """Content-addressed directory of generated reports.
+
+    File names are the sha256 of the encoded image, so two renders never
+    overwrite each other, a name always refers to the same bytes (and can
+    be cached forever by browsers), and saving an identical report again is
+    free. Reports older than REPORTS_MAX_AGE_DAYS are deleted, then the
+    oldest ones until the directory fits in REPORTS_MAX_MB. Eviction runs on
+    start-up, after every new report and every REPORTS_SWEEP_MINUTES (see
+    api.py); an expired report is already treated as missing before that.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None, max_age: float = None):
+        self.directory = directory or os.getenv("REPORTS_DIR", "reports")
+        self.max_bytes = max_bytes or int(os.getenv("REPORTS_MAX_MB", "500")) * 1024 * 1024
+        self.max_age = max_age or float(os.getenv("REPORTS_MAX_AGE_DAYS", "30")) * 86400
+        self.sweep_interval = float(os.getenv("REPORTS_SWEEP_MINUTES") or "60") * 60
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.evict()
+
+    def save(self, data: bytes, extension: str) -> str:
+        """Stores the report and returns its file name."""
+        filename = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+        path = os.path.join(self.directory, filename)
+
+        if os.path.exists(path):
+            # Same bytes already stored; refresh it so retention starts over
+            os.utime(path)
+            return filename
+
+        atomic_write(path, lambda f: f.write(data))
+        self.evict()
+        return filename
+
+    def path(self, filename: str):
+        """Returns the path of a stored report, or None for unknown, expired or malformed names."""
+        if not _FILENAME.match(filename):
+            return None
+        path = os.path.join(self.directory, filename)
+        try:
+            if os.path.getmtime(path) < time.time() - self.max_age:
+                return None
+        except OSError:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def etag(self, filename: str) -> str:
+        # The name is the content hash, which makes it a strong validator
+        return f'"{os.path.splitext(filename)[0]}"'
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def evict(self):
+        with self._lock:
+            evict_oldest(self._entries(), self.max_bytes, self.max_age)
+
+    def _entries(self) -> list:
+        return scan_entries(self.directory, _FILENAME.match)
@@ -0,0 +1,161 @@
+import bisect
+import logging
+import os
+import wave
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.03
+READ_FRAMES = 64 * 1024
+
+
+class Timeline:
+    """Maps positions in the trimmed audio back to the original recording.
+
+    `spans` are the (start, end) ranges of the original recording that were
+    kept, in order; `cut_points` are pause positions in trimmed-audio seconds
+    where a chunk can be split without cutting a word.
+    """
+
+    def __init__(self, path: str, spans: list, original_duration: float, cut_points: list = None):
+        self.path = path
+        self.spans = spans
+        self.original_duration = original_duration
+        self.cut_points = cut_points or []
+        self._starts = []
+        position = 0.0
+        for start, end in spans:
+            self._starts.append(position)
+            position += end - start
+        self.duration = position
+
+    @property
+    def removed_seconds(self) -> float:
+        return self.original_duration - self.duration
+
+    def to_original(self, seconds: float) -> float:
+        i = max(0, bisect.bisect_right(self._starts, seconds) - 1)
+        start, end = self.spans[i]
+        return min(start + seconds - self._starts[i], end)
+
+    def to_trimmed(self, seconds: float) -> float:
+        for position, (start, end) in zip(self._starts, self.spans):
+            if seconds < start:
+                return position
+            if seconds <= end:
+                return position + seconds - start
+        return self.duration
+
+    def to_dict(self) -> dict:
+        return {
+            "original_seconds": round(self.original_duration, 1),
+            "uploaded_seconds": round(self.duration, 1),
+            "removed_seconds": round(self.removed_seconds, 1),
+            "spans": [[round(start, 2), round(end, 2)] for start, end in self.spans],
+        }
+
+
+class SilenceTrimmer:
+    """Energy-based pause detection over 16-bit PCM WAV.
+
+    Frames quieter than the adaptive threshold (noise floor + margin, capped
+    at `ceiling_db` so quiet speech in a recording without real pauses is
+    never taken for silence) are silent; runs of at least `min_pause` seconds become candidate chunk cut
+    points, and runs longer than `max_silence` are shortened to
+    `keep_silence` seconds before upload.
+    """
+
+    def __init__(self, min_pause: float = 0.3, max_silence: float = None, keep_silence: float = None,
+                 margin_db: float = 10.0, floor_db: float = -50.0, ceiling_db: float = -45.0):
+        self.min_pause = min_pause
+        self.max_silence = max_silence if max_silence is not None else float(os.getenv("SILENCE_MAX_SECONDS", "2.0"))
+        self.keep_silence = keep_silence if keep_silence is not None else float(os.getenv("SILENCE_KEEP_SECONDS", "0.5"))
+        self.margin_db = margin_db
+        self.floor_db = floor_db
+        self.ceiling_db = ceiling_db
+
+    def process(self, wav_path: str, output_path: str) -> Timeline:
+        with wave.open(wav_path, "rb") as wav:
+            params = wav.getparams()
+            if params.sampwidth != 2:
+                raise ValueError(f"Silence analysis requires 16-bit PCM, got {params.sampwidth * 8}-bit")
+            levels = self._frame_levels(wav, params)
+
+        duration = params.nframes / params.framerate
+        pauses = self._find_pauses(levels)
+        spans = self._kept_spans(pauses, duration)
+
+        if len(spans) > 1:
+            self._write_spans(wav_path, output_path, params, spans)
+            path = output_path
+        else:
+            path = wav_path
+
+        timeline = Timeline(path, spans, duration)
+        timeline.cut_points = [timeline.to_trimmed((start + end) / 2) for start, end in pauses]
+
+        logger.info(f"{len(pauses)} pauses found, {timeline.removed_seconds:.1f}s of silence removed "
+                    f"({duration / 60:.1f} → {timeline.duration / 60:.1f} minutes)")
+        return timeline
+
+    def _frame_levels(self, wav, params) -> np.ndarray:
+        samples_per_frame = max(1, int(params.framerate * FRAME_SECONDS))
+        block_frames = (READ_FRAMES // samples_per_frame) * samples_per_frame
+        levels = []
+        carry = np.empty(0, dtype=np.float32)
+
+        while True:
+            data = wav.readframes(block_frames)
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype="<i2").astype(np.float32)
+            if params.nchannels > 1:
+                samples = samples.reshape(-1, params.nchannels).mean(axis=1)
+            samples = np.concatenate([carry, samples])
+            usable = len(samples) - len(samples) % samples_per_frame
+            carry = samples[usable:]
+            frames = samples[:usable].reshape(-1, samples_per_frame)
+            rms = np.sqrt(np.mean(frames ** 2, axis=1))
+            levels.append(20 * np.log10(np.maximum(rms, 1.0) / 32768.0))
+
+        return np.concatenate(levels) if levels else np.empty(0)
+
+    def _find_pauses(self, levels: np.ndarray) -> list:
+        if not len(levels):
+            return []
+
+        threshold = min(max(np.percentile(levels, 10) + self.margin_db, self.floor_db), self.ceiling_db)
+        silent = np.concatenate([[False], levels < threshold, [False]])
+        edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+        runs = edges.reshape(-1, 2) * FRAME_SECONDS
+
+        return [(float(start), float(end)) for start, end in runs if end - start >= self.min_pause]
+
+    def _kept_spans(self, pauses: list, duration: float) -> list:
+        spans = []
+        position = 0.0
+        for start, end in pauses:
+            if end - start <= self.max_silence:
+                continue
+            spans.append((position, start + self.keep_silence / 2))
+            position = end - self.keep_silence / 2
+        spans.append((position, duration))
+        return [(start, end) for start, end in spans if end > start]
+
+    def _write_spans(self, wav_path: str, output_path: str, params, spans: list):
+        with wave.open(wav_path, "rb") as source, wave.open(output_path, "wb") as target:
+            target.setnchannels(params.nchannels)
+            target.setsampwidth(params.sampwidth)
+            target.setframerate(params.framerate)
+            frame_size = params.sampwidth * params.nchannels
+
+            for start, end in spans:
+                source.setpos(int(start * params.framerate))
+                remaining = int(end * params.framerate) - int(start * params.framerate)
+                while remaining > 0:
+                    data = source.readframes(min(remaining, READ_FRAMES))
+                    if not data:
+                        break
+                    target.writeframesraw(data)
+                    remaining -= len(data) // frame_size
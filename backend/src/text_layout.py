@@ -0,0 +1,87 @@
+from functools import lru_cache
+
+LINE_HEIGHT = 30
+TITLE_HEIGHT = 50
+ITEM_SPACING = 5
+
+
+@lru_cache(maxsize=16384)
+def word_width(font, word: str) -> float:
+    """Advance width of one word; fonts come from the shared registry, so they are stable keys."""
+    return font.getlength(word)
+
+
+def wrap_text(text: str, font, max_width: int) -> list:
+    """Greedy word wrap in linear time: each word is measured once and widths are summed."""
+    space = word_width(font, " ")
+    lines = []
+    for paragraph in text.split('\n'):
+        current_line = []
+        line_width = 0.0
+        for word in paragraph.split():
+            width = word_width(font, word)
+            candidate = line_width + space + width if current_line else width
+            if candidate <= max_width or not current_line:
+                current_line.append(word)
+                line_width = candidate
+            else:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+                line_width = width
+        if current_line:
+            lines.append(' '.join(current_line))
+    return lines
+
+
+class BulletBlock:
+    """A titled list where every item is wrapped and capped at `lines_per_item` lines."""
+
+    def __init__(self, items, font, max_width, max_items, is_sentences=False, lines_per_item=2):
+        if isinstance(items, str):
+            items = [items]
+        self.item_count = len(items[:max_items])
+        self.items = []
+        for item in items[:max_items]:
+            if is_sentences and not item.strip():
+                continue
+            prefix = f"• {item.strip()}." if is_sentences else f"• {item}"
+            self.items.append(wrap_text(prefix, font, max_width)[:lines_per_item])
+
+    @property
+    def height(self) -> int:
+        line_count = sum(len(lines) for lines in self.items)
+        return TITLE_HEIGHT + line_count * LINE_HEIGHT + self.item_count * ITEM_SPACING
+
+
+class ParagraphBlock:
+    """A titled paragraph wrapped once and capped at `max_lines` lines."""
+
+    def __init__(self, text, font, max_width, max_lines=8):
+        self.lines = wrap_text(text, font, max_width)[:max_lines]
+
+    @property
+    def height(self) -> int:
+        return TITLE_HEIGHT + len(self.lines) * LINE_HEIGHT
+
+
+class ReportLayout:
+    """Wrapped text for every report section, computed once per report.
+
+    `generate_report` sizes the canvas from these blocks and then draws the
+    very same lines, so no text is measured twice.
+    """
+
+    def __init__(self, analysis: dict, font, col_width: int):
+        self.objetivos = BulletBlock(analysis.get('objetivos', []), font, col_width, max_items=3)
+        self.desarrollo = BulletBlock(analysis.get('desarrollo', '').split('.')[:4], font, col_width,
+                                      max_items=4, is_sentences=True)
+        self.recomendaciones = ParagraphBlock(analysis.get('recomendaciones', ''), font, col_width)
+        self.actitud = ParagraphBlock(analysis.get('actitud', ''), font, col_width)
+
+    @property
+    def content_space(self) -> int:
+        return max(self.objetivos.height, self.desarrollo.height)
+
+    @property
+    def bottom_space(self) -> int:
+        return max(self.recomendaciones.height, self.actitud.height)
@@ -0,0 +1,57 @@
+import math
+import re
+
+# Llama tokenizers average roughly 3.5 characters per token on Spanish text
+CHARS_PER_TOKEN = 3.5
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> list:
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
+def split_by_tokens(text: str, budget: int) -> list:
+    """Groups whole sentences into sections of at most ~`budget` tokens.
+
+    A single sentence longer than the budget (Whisper output sometimes has
+    no punctuation for minutes) is cut on word boundaries.
+    """
+    sections = []
+    current = []
+    current_tokens = 0
+
+    for sentence in split_sentences(text):
+        for piece in _split_long(sentence, budget):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > budget:
+                sections.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+
+    if current:
+        sections.append(" ".join(current))
+    return sections
+
+
+def _split_long(sentence: str, budget: int) -> list:
+    if estimate_tokens(sentence) <= budget:
+        return [sentence]
+
+    max_chars = int(budget * CHARS_PER_TOKEN)
+    pieces = []
+    current = ""
+    for word in sentence.split():
+        if current and len(current) + len(word) + 1 > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
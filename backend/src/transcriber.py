@@ -1,91 +1,176 @@
+import asyncio
+import hashlib
+import logging
 import os
-from groq import Groq
+import wave
+from src.audio_chunker import AudioChunker
+from src.audio_encoder import AudioEncoder
+from src.cache import DiskCache
+from src.groq_client import get_gateway
+from src.metrics import AUDIO_SECONDS, BYTES, record_cache
+
+logger = logging.getLogger(__name__)
 
 class AudioTranscriber:
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "GROQ_API_KEY not found. "
-                "Please add your API key to the .env file. "
-                "Get one free at: https://console.groq.com"
-            )
-        self.client = Groq(api_key=api_key)
-        print("✅ Groq Whisper API initialized")
+    MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+    MODEL = "whisper-large-v3-turbo"
+    LANGUAGE = "es"
+    
+    def __init__(self, gateway=None):
+        self.gateway = gateway or get_gateway()
+        self.max_concurrency = int(os.getenv("WHISPER_MAX_CONCURRENCY", "4"))
+        self.encoder = AudioEncoder()
+        self.cache = DiskCache(
+            os.getenv("TRANSCRIPT_CACHE_DIR", "cache/transcripts"),
+            max_bytes=int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "200")) * 1024 * 1024,
+        )
+        logger.info(f"Groq Whisper API initialized ({self.encoder.codec.upper()} uploads)")
+    
+    def transcribe(self, audio_path: str, timeline=None, on_chunk=None) -> str:
+        logger.info(f"Transcribing with Groq Whisper: {audio_path}")
+        
+        key = self._cache_key(audio_path)
+        cached = self.cache.get(key)
+        record_cache("transcripts", cached is not None)
+        if cached is not None:
+            logger.info(f"Transcript cache hit ({len(cached['transcript'])} characters)")
+            return cached["transcript"]
+        
+        transcript = self._transcribe_uncached(audio_path, timeline, on_chunk)
+        AUDIO_SECONDS.inc(self._duration(audio_path), kind="transcribed")
+        if transcript:
+            self.cache.set(key, {"transcript": transcript, "model": self.MODEL, "language": self.LANGUAGE})
+        return transcript
     
-    def transcribe(self, audio_path: str) -> str:
-        print(f"🎤 Transcribing with Groq Whisper: {audio_path}")
+    def _transcribe_uncached(self, audio_path: str, timeline=None, on_chunk=None) -> str:
+        upload_path = audio_path
         
         try:
-            file_size_mb = os.path.getsize(audio_path) / (1024 * 1024)
-            print(f"📊 File size: {file_size_mb:.2f} MB")
+            upload_path = self.encoder.encode_file(audio_path)
+            upload_size = os.path.getsize(upload_path)
+            file_size_mb = upload_size / (1024 * 1024)
+            logger.info(f"Upload size: {file_size_mb:.2f} MB", extra={"upload_bytes": upload_size})
             
-            if file_size_mb < 20:
-                return self._transcribe_file(audio_path)
+            if upload_size < self.MAX_UPLOAD_BYTES:
+                return self.gateway.run(self._transcribe_file(upload_path))
             
-            print(f"⚠️  Large file ({file_size_mb:.2f}MB), splitting into chunks...")
-            return self._transcribe_large_file(audio_path)
-            
-        except Exception as e:
-            print(f"❌ Transcription error: {e}")
-            return ""
+            logger.info(f"Large file ({file_size_mb:.2f}MB), splitting into chunks...")
+            return self.gateway.run(
+                self._transcribe_large_file(audio_path, upload_size, upload_path != audio_path, timeline, on_chunk)
+            )
+        finally:
+            if upload_path != audio_path and os.path.exists(upload_path):
+                os.remove(upload_path)
+    
+    def _duration(self, audio_path: str) -> float:
+        try:
+            return AudioChunker(audio_path).duration
+        except (ValueError, EOFError, wave.Error):
+            return 0.0
+    
+    def _cache_key(self, audio_path: str) -> str:
+        """Hash of the decoded PCM (not the container bytes) plus model and language."""
+        digest = hashlib.sha256(f"{self.MODEL}|{self.LANGUAGE}|".encode())
+        try:
+            with wave.open(audio_path, "rb") as wav:
+                digest.update(repr(wav.getparams()[:3]).encode())
+                for block in iter(lambda: wav.readframes(64 * 1024), b""):
+                    digest.update(block)
+        except (wave.Error, EOFError):
+            with open(audio_path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+        return digest.hexdigest()
     
-    def _transcribe_file(self, audio_path: str) -> str:
+    async def _transcribe_file(self, audio_path: str) -> str:
         with open(audio_path, "rb") as audio_file:
-            transcription = self.client.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-large-v3-turbo",
-                language="es",
-                response_format="text",
-                temperature=0.0
-            )
+            data = await asyncio.to_thread(audio_file.read)
+        return await self._transcribe_audio((os.path.basename(audio_path), data))
+    
+    async def _transcribe_audio(self, audio) -> str:
+        name, data = audio
+        BYTES.inc(data.getbuffer().nbytes if hasattr(data, "getbuffer") else len(data), kind="whisper_upload")
+        transcription = await self.gateway.transcribe(
+            audio,
+            model=self.MODEL,
+            language=self.LANGUAGE,
+            response_format="text",
+            temperature=0.0
+        )
         
         transcript = transcription.strip()
-        print(f"✅ Transcription completed: {len(transcript)} characters")
+        logger.info(f"Transcription completed: {len(transcript)} characters", extra={"transcript_chars": len(transcript)})
         
         if len(transcript) > 0:
-            print(f"📄 First 200 characters: {transcript[:200]}...")
+            logger.debug(f"First 200 characters: {transcript[:200]}...")
         
         return transcript
     
-    def _transcribe_large_file(self, audio_path: str) -> str:
-        from pydub import AudioSegment
-        import math
-        
-        audio = AudioSegment.from_file(audio_path)
-        duration_ms = len(audio)
-        duration_min = duration_ms / (1000 * 60)
+    async def _transcribe_large_file(self, audio_path: str, upload_size: int, encoded: bool = False, timeline=None, on_chunk=None) -> str:
+        chunker = AudioChunker(audio_path)
         
-        print(f"⏱️  Audio duration: {duration_min:.1f} minutes")
+        # Size chunks from the bitrate of what is actually uploaded, keeping
+        # a margin because speech does not compress evenly
+        bytes_per_second = upload_size / max(chunker.duration, 1)
+        chunk_seconds = max(60, int(self.MAX_UPLOAD_BYTES * 0.85 / bytes_per_second))
+        windows = chunker.windows(
+            chunk_seconds,
+            max_chunk_bytes=None if encoded else self.MAX_UPLOAD_BYTES,
+            cut_points=timeline.cut_points if timeline else None,
+        )
+        num_chunks = len(windows)
         
-        chunk_length_ms = 10 * 60 * 1000
-        num_chunks = math.ceil(duration_ms / chunk_length_ms)
+        logger.info(f"Audio duration: {chunker.duration / 60:.1f} minutes")
+        logger.info(f"Splitting into {num_chunks} chunks of ~{chunk_seconds / 60:.1f} minutes...")
+        logger.info(f"Uploading up to {self.max_concurrency} chunks concurrently...")
         
-        print(f"🔪 Splitting into {num_chunks} chunks of ~10 minutes...")
-        
-        transcripts = []
-        
-        for i in range(num_chunks):
-            start_ms = i * chunk_length_ms
-            end_ms = min((i + 1) * chunk_length_ms, duration_ms)
-            
-            print(f"📝 Processing chunk {i+1}/{num_chunks} ({start_ms//1000//60}:{start_ms//1000%60:02d} - {end_ms//1000//60}:{end_ms//1000%60:02d})...")
-            
-            chunk = audio[start_ms:end_ms]
-            chunk_path = f"temp_chunk_{i}.wav"
-            chunk.export(chunk_path, format="wav")
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+        async def transcribe_chunk(i):
+            start, end = windows[i]
+            start_s, end_s = chunker.seconds(start), chunker.seconds(end)
+            if timeline:
+                # Report positions in the original recording, not the trimmed audio
+                start_s, end_s = timeline.to_original(start_s), timeline.to_original(end_s)
+            start_s, end_s = int(start_s), int(end_s)
             
-            try:
-                chunk_transcript = self._transcribe_file(chunk_path)
-                transcripts.append(chunk_transcript)
-            except Exception as e:
-                print(f"⚠️  Error in chunk {i+1}: {e}")
-                transcripts.append("")
-            finally:
-                if os.path.exists(chunk_path):
-                    os.remove(chunk_path)
+            async with semaphore:
+                logger.info(f"Processing chunk {i+1}/{num_chunks} ({start_s//60}:{start_s%60:02d} - {end_s//60}:{end_s%60:02d})...")
+                text = await self._transcribe_window(chunker, start, end, f"chunk_{i}", encoded)
+            if on_chunk:
+                # Reported as soon as it is ready, possibly before earlier chunks
+                on_chunk({"index": i, "total": num_chunks, "start": start_s, "end": end_s, "text": text})
+            return text
+        
+        # gather() keeps chunk order even when uploads finish out of order
+        tasks = [asyncio.ensure_future(transcribe_chunk(i)) for i in range(num_chunks)]
+        try:
+            transcripts = await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
         
         full_transcript = " ".join(transcripts)
-        print(f"✅ Complete transcription: {len(full_transcript)} characters ({num_chunks} chunks)")
+        logger.info(f"Complete transcription: {len(full_transcript)} characters ({num_chunks} chunks)")
         
         return full_transcript
+    
+    async def _transcribe_window(self, chunker, start: int, end: int, name: str, encoded: bool) -> str:
+        # Each chunk reads only its own window, so memory stays bounded
+        # by max_concurrency * chunk size
+        if not encoded:
+            buffer = await asyncio.to_thread(chunker.read, start, end)
+            return await self._transcribe_audio((f"{name}.wav", buffer))
+        
+        payload = await asyncio.to_thread(
+            self.encoder.encode_window, chunker.audio_path, chunker.seconds(start), chunker.seconds(end - start)
+        )
+        if len(payload) >= self.MAX_UPLOAD_BYTES and end - start > chunker.frame_rate * 60:
+            logger.warning(f"{name} encoded to {len(payload) / (1024 * 1024):.2f} MB, splitting it in half...")
+            middle = (start + end) // 2
+            return " ".join([
+                await self._transcribe_window(chunker, start, middle, f"{name}a", encoded),
+                await self._transcribe_window(chunker, middle, end, f"{name}b", encoded),
+            ])
+        return await self._transcribe_audio((f"{name}.{self.encoder.extension}", payload))
@@ -0,0 +1,150 @@
+import logging
+import os
+import re
+from src.tokens import estimate_tokens, split_sentences
+
+logger = logging.getLogger(__name__)
+
+# Phrases Whisper produces on silence or music (from subtitled videos in its
+# training data), matched against a whole sentence after normalization
+_HALLUCINATION = re.compile(
+    r"^(?:"
+    r"(?:muchas )?gracias(?: por (?:ver|vernos|su atención|mirar)(?: el video)?)?"
+    r"|.*amara\.org.*"
+    r"|subt[ií]tulos (?:realizados )?por .*"
+    r"|(?:no olvides )?suscr[ií]b[ea]te.*"
+    r"|nos vemos en el (?:próximo|siguiente) video"
+    r")$"
+)
+_EDGE_PUNCTUATION = "¡!¿?.,;:…\"'«» "
+
+_FILLER = re.compile(
+    r"(?<!\w)(?:e+h+|e+m+|m{3,}|m+h+m*|a+h+|u+h+m*|u+m+|h+m+|este(?=\s*(?:\.\.\.|…)))(?!\w)\s*(?:\.\.\.|…|[,.])?",
+    re.IGNORECASE,
+)
+# A single word ("que que") or a phrase of 3 to 8 words said again right after itself,
+# separated only by spaces. Commas and points are left alone because they may belong
+# to a number ("2,2 metros", "10.10 horas"), and so are two-word units ("por dos por dos").
+_WORD = r"[^\W\d_]+"
+_REPEATED_PHRASE = re.compile(
+    rf"\b({_WORD}|(?:{_WORD}\s+){{2,7}}{_WORD})(?:\s+\1\b)+",
+    re.IGNORECASE,
+)
+# Repeating a number or an operator changes the math, so phrases with these are kept
+_NUMBER_WORDS = {
+    "cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve", "diez",
+    "once", "doce", "trece", "catorce", "quince", "veinte", "treinta", "cuarenta", "cincuenta", "sesenta",
+    "setenta", "ochenta", "noventa", "cien", "ciento", "mil", "millón", "millones", "medio", "media",
+}
+_MATH_WORDS = _NUMBER_WORDS | {
+    "una", "un", "por", "más", "menos", "entre", "igual", "elevado", "raíz", "punto", "coma",
+}
+# After a quantity, "mmm" or "em" may be a unit ("5 mm"), never filler
+_PREVIOUS_WORD = re.compile(r"(\w+)\s*$")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([,.;:!?…])")
+_REPEATED_COMMAS = re.compile(r",(?:\s*,)+")
+_LEADING_PUNCTUATION = re.compile(r"^[\s,;:.…]+")
+
+
+class CompactTranscript:
+    def __init__(self, text: str, tokens_before: int, hallucinations: int = 0, dropped_for_budget: int = 0):
+        self.text = text
+        self.tokens_before = tokens_before
+        self.tokens_after = estimate_tokens(text)
+        self.hallucinations = hallucinations
+        self.dropped_for_budget = dropped_for_budget
+
+    def to_dict(self) -> dict:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "hallucinations_removed": self.hallucinations,
+            "sentences_dropped_for_budget": self.dropped_for_budget,
+        }
+
+
+class TranscriptCompactor:
+    """Shrinks a Whisper transcript before it is sent to the LLM.
+
+    Drops sentences that are known Whisper hallucinations, filler
+    interjections ("eh", "mmm") and consecutive repetitions of words,
+    phrases and sentences. With a token budget (TRANSCRIPT_TOKEN_BUDGET,
+    0 = none), the shortest sentences — mostly backchannel like "Sí." or
+    "Ok." — are dropped next until the transcript fits.
+    """
+
+    def __init__(self, token_budget: int = None):
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "0"))
+
+    def compact(self, transcript: str) -> CompactTranscript:
+        tokens_before = estimate_tokens(transcript)
+
+        sentences = []
+        hallucinations = 0
+        previous = None
+        for sentence in split_sentences(transcript):
+            key = _normalize(sentence)
+            if _HALLUCINATION.match(key):
+                hallucinations += 1
+                continue
+            sentence = _clean(sentence)
+            key = _normalize(sentence)
+            # Whisper sometimes loops on a sentence; keep one copy
+            if not key or key == previous:
+                continue
+            sentences.append(sentence)
+            previous = key
+
+        sentences, dropped = self._fit_budget(sentences)
+        result = CompactTranscript(" ".join(sentences), tokens_before, hallucinations, dropped)
+        logger.info(
+            f"Transcript compacted: ~{result.tokens_before} -> ~{result.tokens_after} tokens "
+            f"({hallucinations} hallucinations, {dropped} sentences dropped for the budget)",
+            extra={"tokens_before": result.tokens_before, "tokens_after": result.tokens_after},
+        )
+        return result
+
+    def _fit_budget(self, sentences: list):
+        if not self.token_budget:
+            return sentences, 0
+        total = sum(estimate_tokens(sentence) + 1 for sentence in sentences)
+        if total <= self.token_budget:
+            return sentences, 0
+
+        dropped = set()
+        for i in sorted(range(len(sentences)), key=lambda i: len(sentences[i])):
+            if total <= self.token_budget:
+                break
+            dropped.add(i)
+            total -= estimate_tokens(sentences[i]) + 1
+        return [sentence for i, sentence in enumerate(sentences) if i not in dropped], len(dropped)
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.lower().split()).strip(_EDGE_PUNCTUATION)
+
+
+def _drop_filler(match) -> str:
+    previous = _PREVIOUS_WORD.search(match.string, 0, match.start())
+    if previous and (previous.group(1).isdigit() or previous.group(1).lower() in _NUMBER_WORDS):
+        return match.group(0)
+    return " "
+
+
+def _collapse_repeat(match) -> str:
+    if _MATH_WORDS.intersection(match.group(1).lower().split()):
+        return match.group(0)
+    return match.group(1)
+
+
+def _clean(sentence: str) -> str:
+    capitalized = sentence.lstrip(_EDGE_PUNCTUATION)[:1].isupper()
+    sentence = _FILLER.sub(_drop_filler, sentence)
+    sentence = _REPEATED_PHRASE.sub(_collapse_repeat, sentence)
+    sentence = _SPACE_BEFORE_PUNCTUATION.sub(r"\1", sentence)
+    sentence = _REPEATED_COMMAS.sub(",", sentence)
+    sentence = _LEADING_PUNCTUATION.sub("", " ".join(sentence.split()))
+    # Nothing left but punctuation once the filler is gone
+    if not any(char.isalnum() for char in sentence):
+        return ""
+    return sentence[:1].upper() + sentence[1:] if capitalized else sentence
@@ -0,0 +1,80 @@
+import importlib
+import json
+import io
+import time
+import wave
+import pytest
+from fastapi.testclient import TestClient
+
+ANALYSIS = {
+    "objetivos": ["Resolver ecuaciones"],
+    "desarrollo": "Trabajó con atención.",
+    "actitud": "Participativa",
+    "recomendaciones": "Practicar fracciones.",
+}
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("api")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(directory)
+        patch.setenv("GROQ_API_KEY", "test")
+        patch.setenv("REPORT_WORKERS", "1")
+        patch.setenv("REPORTS_DIR", str(directory / "reports"))
+        patch.setenv("LOGO_DIR", str(directory / "logos"))
+        module = importlib.import_module("api")
+        patch.setattr(module.transcriber, "transcribe", lambda path, timeline=None, on_chunk=None: "Hoy resolvimos ecuaciones.")
+        patch.setattr(module.analyzer, "analyze_class", lambda text, regenerate=False, on_token=None: ANALYSIS)
+        with TestClient(module.app) as client:
+            module.client = client
+            yield module
+
+
+def wav_upload(seconds=2, rate=16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x10\x00\xf0\xff" * (seconds * rate // 2))
+    return buffer.getvalue()
+
+
+def test_analyze_class_job_runs_to_success(api):
+    response = api.client.post(
+        "/analyze_class",
+        files={"video": ("clase.wav", wav_upload(), "audio/wav")},
+        data={"student_name": "Ana", "teacher_name": "Luis"},
+    )
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    deadline = time.monotonic() + 30
+    while True:
+        job = api.client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("success", "error") or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+
+    assert job["status"] == "success", job
+    assert job["report"] == ANALYSIS
+    assert job["transcript"] == "Hoy resolvimos ecuaciones."
+
+
+def test_unknown_job_and_report_are_404(api):
+    assert api.client.get("/jobs/nope").status_code == 404
+    assert api.client.get(f"/reports/{'0' * 32}.png").status_code == 404
+
+
+def test_generate_report_inline(api):
+    response = api.client.post("/generate_report", data={
+        "analysis": json.dumps(ANALYSIS),
+        "student_name": "Ana",
+        "teacher_name": "Luis",
+        "output_format": "png",
+        "inline": "true",
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content.startswith(b"\x89PNG")
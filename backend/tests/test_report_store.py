@@ -0,0 +1,45 @@
+import os
+import time
+from src.report_store import ReportStore
+
+
+def age(store, filename, seconds):
+    path = os.path.join(store.directory, filename)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_same_bytes_same_name(tmp_path):
+    store = ReportStore(str(tmp_path), max_bytes=1024, max_age=3600)
+    assert store.save(b"report", "png") == store.save(b"report", "png")
+    assert store.stats()["entries"] == 1
+
+
+def test_unknown_malformed_and_expired_names(tmp_path):
+    store = ReportStore(str(tmp_path), max_bytes=1024, max_age=3600)
+    filename = store.save(b"report", "png")
+    assert store.path(filename) is not None
+    assert store.path("0" * 32 + ".png") is None
+    assert store.path("../secret.png") is None
+
+    age(store, filename, 7200)
+    assert store.path(filename) is None
+
+
+def test_evict_by_age_then_size(tmp_path):
+    store = ReportStore(str(tmp_path), max_bytes=10, max_age=3600)
+    expired = store.save(b"a", "png")
+    age(store, expired, 7200)
+    oldest = store.save(b"b" * 6, "png")
+    age(store, oldest, 60)
+    newest = store.save(b"c" * 6, "png")
+
+    assert sorted(os.listdir(tmp_path)) == [newest]
+
+
+def test_evicts_on_start(tmp_path):
+    filename = ReportStore(str(tmp_path), max_bytes=1024, max_age=3600).save(b"report", "png")
+    age(ReportStore(str(tmp_path), max_bytes=1024, max_age=3600), filename, 7200)
+
+    ReportStore(str(tmp_path), max_bytes=1024, max_age=3600)
+    assert os.listdir(tmp_path) == []
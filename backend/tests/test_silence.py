@@ -0,0 +1,38 @@
+import wave
+import numpy as np
+from src.silence import SilenceTrimmer
+
+RATE = 16000
+
+
+def write_wav(path, segments):
+    """`segments` are (seconds, level in dBFS) pairs of white noise; None is digital silence."""
+    rng = np.random.default_rng(0)
+    parts = []
+    for seconds, level in segments:
+        scale = 0 if level is None else 32768 * 10 ** (level / 20)
+        parts.append(rng.normal(0, scale, int(seconds * RATE)))
+    samples = np.clip(np.concatenate(parts), -32768, 32767).astype("<i2")
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+
+
+def trim(tmp_path, segments):
+    source = tmp_path / "audio.wav"
+    write_wav(source, segments)
+    return SilenceTrimmer(max_silence=2.0, keep_silence=0.5).process(str(source), str(tmp_path / "trimmed.wav"))
+
+
+def test_quiet_speech_survives_without_real_pauses(tmp_path):
+    # A student far from the microphone, ~20 dB below the teacher, never silent
+    timeline = trim(tmp_path, [(8, -15), (4, -35)] * 5)
+    assert timeline.removed_seconds < 0.5
+
+
+def test_long_silence_is_shortened(tmp_path):
+    timeline = trim(tmp_path, [(5, -15), (4, -35), (6, None), (5, -15)])
+    assert 5.0 < timeline.removed_seconds < 6.0
+    assert timeline.to_original(timeline.duration) == 20.0
@@ -0,0 +1,59 @@
+import pytest
+from src.transcript_compactor import TranscriptCompactor
+
+
+def compact(text):
+    return TranscriptCompactor(token_budget=0).compact(text).text
+
+
+@pytest.mark.parametrize("text", [
+    "El resultado es 2,2 metros.",
+    "Son las 10.10 horas.",
+    "Dos por dos por dos es ocho.",
+    "Página 12, 12 ejercicios.",
+    "El valor es 1.1",
+    "Multiplica 3 3 veces.",
+    "Dos por dos por dos por dos por dos es treinta y dos.",
+    "Vamos a ver, vamos a ver la ecuación.",
+    "La pieza mide 5 mm de largo.",
+    "Son 3 mm, no 3 cm.",
+    "Mide cinco mmm de ancho.",
+])
+def test_keeps_numbers_and_punctuated_repeats(text):
+    assert compact(text) == text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Que que que la x es positiva.", "Que la x es positiva."),
+    ("Vamos a ver vamos a ver la ecuación.", "Vamos a ver la ecuación."),
+    ("Muy muy bien.", "Muy bien."),
+])
+def test_collapses_repeated_words_and_phrases(text, expected):
+    assert compact(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Eh, bueno, mmm, empezamos.", "Bueno, empezamos."),
+    ("Uh, uhm, hm.", ""),
+    ("Mhm, bueno, la derivada.", "Bueno, la derivada."),
+    ("Este... la derivada.", "la derivada."),
+])
+def test_drops_filler(text, expected):
+    assert compact(text) == expected
+
+
+def test_drops_hallucinations_and_counts_tokens():
+    result = TranscriptCompactor(token_budget=0).compact(
+        "Hoy vemos fracciones. ¡Gracias! Subtítulos realizados por la comunidad de Amara.org"
+    )
+    assert result.text == "Hoy vemos fracciones."
+    assert result.hallucinations == 2
+    assert result.tokens_after < result.tokens_before
+
+
+def test_budget_drops_shortest_sentences_first():
+    result = TranscriptCompactor(token_budget=18).compact(
+        "Sí. Ok. Vamos a resolver la ecuación cuadrática por factorización. Ya."
+    )
+    assert result.text == "Vamos a resolver la ecuación cuadrática por factorización."
+    assert result.dropped_for_budget == 3
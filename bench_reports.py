@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark del render de reportes (ReportGenerator.generate_report)
+Mide latencia (p50/p95/máx) y memoria pico por caso, y la compara con una línea base
+
+Uso:
+    python bench_reports.py --save-baseline     # guarda la línea base de esta máquina
+    python bench_reports.py                     # compara; sale con código 1 si hay regresión o no hay línea base
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_reports_baseline.json")
+
+FRASE = ("El estudiante resolvió ecuaciones cuadráticas por factorización y explicó cada paso "
+         "con claridad, relacionando el discriminante con el número de soluciones")
+
+# Casos por tamaño de contenido, con y sin foto/logo. El layout dibuja hasta 3 objetivos
+# de 2 líneas, así que "objetivos_largos" varía el largo de cada uno (todo se ajusta antes de recortar)
+CASES = {
+    "corto": {"objetivos": 1, "frases_objetivo": 1, "frases": 2, "texto": 1, "foto": False, "logo": False},
+    "largo": {"objetivos": 3, "frases_objetivo": 1, "frases": 12, "texto": 10, "foto": False, "logo": False},
+    "objetivos_largos": {"objetivos": 3, "frases_objetivo": 8, "frases": 4, "texto": 3, "foto": False, "logo": False},
+    "con_foto": {"objetivos": 3, "frases_objetivo": 1, "frases": 4, "texto": 3, "foto": True, "logo": False},
+    "con_logo": {"objetivos": 3, "frases_objetivo": 1, "frases": 4, "texto": 3, "foto": False, "logo": True},
+    "completo": {"objetivos": 3, "frases_objetivo": 1, "frases": 12, "texto": 10, "foto": True, "logo": True},
+}
+
+
+def build_analysis(case):
+    return {
+        "objetivos": [f"Objetivo {i + 1}: " + ", ".join([FRASE] * case["frases_objetivo"])
+                      for i in range(case["objetivos"])],
+        "desarrollo": ". ".join([FRASE] * case["frases"]) + ".",
+        "actitud": " ".join([FRASE + "."] * case["texto"]),
+        "recomendaciones": " ".join([FRASE + "."] * case["texto"]),
+    }
+
+
+def create_assets(directory):
+    """Foto de 12 MP (como la de un teléfono) y un logo cuadrado"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    photo_path = os.path.join(directory, "foto.jpg")
+    noise = Image.fromarray(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8))
+    noise.resize((4000, 3000)).save(photo_path, quality=90)
+
+    logo_path = os.path.join(directory, "logo.png")
+    Image.new("RGB", (400, 400), (20, 80, 200)).save(logo_path)
+    return photo_path, logo_path
+
+
+def _proc_status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _start_peak_tracking():
+    """Devuelve la memoria actual (MB) y reinicia el pico cuando el sistema lo permite"""
+    if os.path.exists("/proc/self/clear_refs"):
+        # Linux: el pico (VmHWM) se hereda del proceso padre; escribir "5" lo reinicia
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _proc_status_mb("VmRSS")
+    return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    if os.path.exists("/proc/self/status"):
+        return _proc_status_mb("VmHWM")
+    # macOS reporta ru_maxrss en bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+
+def run_case(name, iterations, workdir, photo_path, logo_path):
+    """Se ejecuta en un proceso nuevo para que la memoria pico sea solo la de este caso"""
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+    from src.report_generator import ReportGenerator
+
+    case = CASES[name]
+    analysis = build_analysis(case)
+    kwargs = {
+        "session_photo_path": photo_path if case["foto"] else None,
+        "logo_path": logo_path if case["logo"] else None,
+        "student_name": "Ana Rodríguez",
+        "teacher_name": "Carlos Mendoza",
+        "session_date": "2024-05-03",
+    }
+
+    generator = ReportGenerator()
+    rss_before = _start_peak_tracking()
+
+    start = time.perf_counter()
+    generator.generate_report(analysis, **kwargs)
+    first = time.perf_counter() - start
+
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        # Distinct session numbers so the report cache does not answer the measured renders
+        generator.generate_report(analysis, session_number=i + 2, **kwargs)
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "first_ms": round(first * 1000, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "peak_mb": round(_peak_rss_mb() - rss_before, 1),
+    }
+
+
+def compare(results, baseline, tolerance, memory_slack_mb):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {base['p50_ms']} → {result['p50_ms']} ms")
+        # p95 es más ruidoso que la mediana, se le permite el doble de variación
+        if result["p95_ms"] > base["p95_ms"] * (1 + 2 * tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} → {result['p95_ms']} ms")
+        if result["peak_mb"] > base["peak_mb"] * (1 + tolerance) + memory_slack_mb:
+            regressions.append(f"{name}: memoria pico {base['peak_mb']} → {result['peak_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del render de reportes")
+    parser.add_argument("--iterations", type=int, default=20, help="renders medidos por caso")
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), help="casos a ejecutar (por defecto todos)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="archivo JSON de la línea base")
+    parser.add_argument("--save-baseline", action="store_true", help="guarda los resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="aumento relativo permitido (0.25 = 25%%)")
+    parser.add_argument("--memory-slack", type=float, default=5.0, help="MB extra permitidos en memoria pico")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="sin línea base solo muestra los resultados y sale con código 0")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("⏱️  MORE INSIGHT ENGINE - Benchmark de reportes")
+    print("=" * 70 + "\n")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_reports_") as workdir:
+        photo_path, logo_path = create_assets(workdir)
+        for name in args.cases or CASES:
+            # Un proceso por caso: la memoria pico no arrastra la de casos anteriores
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results[name] = executor.submit(run_case, name, args.iterations, workdir, photo_path, logo_path).result()
+            r = results[name]
+            print(f"{name:<18} primero {r['first_ms']:>7} ms | p50 {r['p50_ms']:>7} ms | "
+                  f"p95 {r['p95_ms']:>7} ms | máx {r['max_ms']:>7} ms | pico {r['peak_mb']:>6} MB")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Línea base guardada en: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️  No hay línea base en {args.baseline}; ejecuta con --save-baseline para crearla")
+        # Sin línea base no se puede detectar una regresión: no se reporta como éxito
+        return 0 if args.allow_missing_baseline else 2
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance, args.memory_slack)
+    if regressions:
+        print("\n❌ REGRESIONES DETECTADAS:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        return 1
+
+    print("\n✅ Sin regresiones respecto a la línea base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
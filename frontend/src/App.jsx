@@ -7,6 +7,14 @@ import StatusMessage from './components/StatusMessage'
 import AnalysisForm from './components/AnalysisForm'
 import './index.css'
 
+const STAGE_LABELS = {
+  queued: 'En cola...',
+  extracting: 'Extrayendo audio...',
+  detecting_silence: 'Detectando pausas...',
+  transcribing: 'Transcribiendo...',
+  analyzing: 'Analizando...'
+}
+
 function App() {
   const [videoFile, setVideoFile] = useState(null)
   const [sessionPhoto, setSessionPhoto] = useState(null)
@@ -27,6 +35,9 @@ function App() {
   const [result, setResult] = useState(null)
   const [error, setError] = useState(null)
   const [generatingReport, setGeneratingReport] = useState(false)
+  const [jobStage, setJobStage] = useState(null)
+  const [liveTranscript, setLiveTranscript] = useState({})
+  const [liveAnalysis, setLiveAnalysis] = useState('')
 
   const handleVideoChange = (e) => {
     setVideoFile(e.target.files[0])
@@ -39,6 +50,30 @@ function App() {
     setResult(null)
   }
 
+  // Sigue el trabajo por Server-Sent Events: etapas, fragmentos transcritos y tokens del análisis
+  const waitForJob = (jobId) => new Promise((resolve, reject) => {
+    const source = new EventSource(`http://localhost:8000/jobs/${jobId}/events`)
+    const read = (e) => JSON.parse(e.data)
+
+    source.addEventListener('stage', (e) => setJobStage(read(e).stage))
+    source.addEventListener('chunk', (e) => {
+      const chunk = read(e)
+      setLiveTranscript((prev) => ({ ...prev, [chunk.index]: chunk.text }))
+    })
+    source.addEventListener('transcript', (e) => setLiveTranscript({ 0: read(e).text }))
+    source.addEventListener('token', (e) => setLiveAnalysis((prev) => prev + read(e).text))
+    source.addEventListener('result', (e) => {
+      source.close()
+      resolve(read(e))
+    })
+    source.addEventListener('error', (e) => {
+      // Sin datos es un corte de conexión: EventSource reconecta solo y retoma desde el último evento
+      if (!e.data) return
+      source.close()
+      reject(new Error(read(e).message))
+    })
+  })
+
   const handleSubmit = async (e) => {
     e.preventDefault()
     if (!videoFile) {
@@ -50,6 +85,8 @@ function App() {
     setError(null)
     setAnalysisData(null)
     setResult(null)
+    setLiveTranscript({})
+    setLiveAnalysis('')
 
     const formData = new FormData()
     formData.append('video', videoFile)
@@ -64,19 +101,23 @@ function App() {
         headers: { 'Content-Type': 'multipart/form-data' }
       })
 
-      setAnalysisData(response.data)
-      const desarrollo = response.data.report.desarrollo
-
-      setObjetivos(Array.isArray(desarrollo.objetivos) ? desarrollo.objetivos : [])
-      setDesarrollo(typeof desarrollo.desarrollo === 'string' ? desarrollo.desarrollo : JSON.stringify(desarrollo.desarrollo))
-      setActitud(typeof desarrollo.actitud === 'string' ? desarrollo.actitud : String(desarrollo.actitud))
-      setRecomendaciones(typeof desarrollo.recomendaciones === 'string' ? desarrollo.recomendaciones : '')
+      if (response.data.status === 'error') {
+        throw new Error(response.data.message)
+      }
 
+      const job = await waitForJob(response.data.job_id)
+      setAnalysisData(job)
+      // El backend valida el análisis: siempre llegan los cuatro campos con su tipo
+      setObjetivos(job.report.objetivos)
+      setDesarrollo(job.report.desarrollo)
+      setActitud(job.report.actitud)
+      setRecomendaciones(job.report.recomendaciones)
 
     } catch (err) {
-      setError(err.response?.data?.message || 'Error al procesar el archivo')
+      setError(err.response?.data?.message || err.message || 'Error al procesar el archivo')
     } finally {
       setLoading(false)
+      setJobStage(null)
     }
   }
 
@@ -217,7 +258,7 @@ function App() {
               {loading ? (
                 <>
                   <Loader2 className="h-5 w-5 animate-spin" />
-                  Analizando...
+                  {STAGE_LABELS[jobStage] || 'Analizando...'}
                 </>
               ) : (
                 'Analizar Clase'
@@ -229,6 +270,19 @@ function App() {
             <StatusMessage type="error" title="Error" message={error} />
           )}
 
+          {loading && (Object.keys(liveTranscript).length > 0 || liveAnalysis) && (
+            <div className="mt-6 bg-gray-50 rounded-lg p-4 space-y-3">
+              {Object.keys(liveTranscript).length > 0 && (
+                <p className="text-gray-600 text-sm leading-relaxed">
+                  {Object.keys(liveTranscript).sort((a, b) => a - b).map((index) => liveTranscript[index]).join(' ')}
+                </p>
+              )}
+              {liveAnalysis && (
+                <pre className="text-gray-800 text-xs whitespace-pre-wrap">{liveAnalysis}</pre>
+              )}
+            </div>
+          )}
+
           {analysisData && !result && (
             <div className="mt-6 space-y-4">
               <StatusMessage
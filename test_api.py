@@ -7,6 +7,7 @@ import requests
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
 # URL del servidor
@@ -42,6 +43,20 @@ def create_test_video():
         print(f"⚠️  Error creando video: {e}")
         return None
 
+def wait_for_job(api_url, job_id, timeout=600, interval=2):
+    """/analyze_class solo encola el trabajo: consulta /jobs/{job_id} hasta que termine"""
+    deadline = time.time() + timeout
+    stage = None
+    while time.time() < deadline:
+        job = requests.get(f"{api_url}/jobs/{job_id}", timeout=30).json()
+        if job.get("status") in ("success", "error"):
+            return job
+        if job.get("stage") != stage:
+            stage = job.get("stage")
+            print(f"   - Etapa: {stage} ({job.get('progress', 0):.0%})")
+        time.sleep(interval)
+    raise requests.exceptions.Timeout(f"El trabajo {job_id} no terminó en {timeout} s")
+
 def test_analyze_endpoint(video_path=None):
     """Prueba el endpoint /analyze_class"""
     
@@ -86,7 +101,12 @@ def test_analyze_endpoint(video_path=None):
             )
             
             if response.status_code == 200:
-                result = response.json()
+                job_id = response.json()["job_id"]
+                print(f"📥 Trabajo encolado: {job_id}")
+                result = wait_for_job(API_URL, job_id)
+                if result.get("status") == "error":
+                    print(f"❌ El análisis falló: {result.get('message')}")
+                    return
                 
                 print(f"\n{'='*60}")
                 print(f"✅ ANÁLISIS COMPLETADO")
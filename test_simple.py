@@ -9,6 +9,7 @@ import wave
 import struct
 import math
 import os
+import time
 
 def create_simple_test_file():
     """Crea un archivo de audio WAV simple para prueba"""
@@ -30,9 +31,23 @@ def create_simple_test_file():
     print(f"✅ Archivo de prueba creado: {filename}")
     return filename
 
+def wait_for_job(api_url, job_id, timeout=600, interval=2):
+    """/analyze_class solo encola el trabajo: consulta /jobs/{job_id} hasta que termine"""
+    deadline = time.time() + timeout
+    stage = None
+    while time.time() < deadline:
+        job = requests.get(f"{api_url}/jobs/{job_id}", timeout=30).json()
+        if job.get("status") in ("success", "error"):
+            return job
+        if job.get("stage") != stage:
+            stage = job.get("stage")
+            print(f"   - Etapa: {stage} ({job.get('progress', 0):.0%})")
+        time.sleep(interval)
+    raise requests.exceptions.Timeout(f"El trabajo {job_id} no terminó en {timeout} s")
+
 def test_api():
     """Prueba el endpoint de análisis"""
-    API_URL = "http://localhost:8000/analyze_class"
+    API_URL = "http://localhost:8000"
     
     print("\n" + "="*70)
     print("🧪 MORE INSIGHT ENGINE - Prueba de Análisis JSON")
@@ -54,10 +69,15 @@ def test_api():
                 'teacher_name': 'Carlos Mendoza'
             }
             
-            response = requests.post(API_URL, files=files, data=data, timeout=300)
+            response = requests.post(f"{API_URL}/analyze_class", files=files, data=data, timeout=300)
         
         if response.status_code == 200:
-            result = response.json()
+            job_id = response.json()["job_id"]
+            print(f"📥 Trabajo encolado: {job_id}")
+            result = wait_for_job(API_URL, job_id)
+            if result.get("status") == "error":
+                print(f"❌ El análisis falló: {result.get('message')}")
+                return
             
             print("="*70)
             print("✅ ANÁLISIS COMPLETADO")
@@ -92,7 +112,7 @@ def test_api():
             print("="*70)
             print(f"✓ objetivos: {len(report.get('objetivos', []))} items")
             print(f"✓ desarrollo: {len(report.get('desarrollo', ''))} caracteres")
-            print(f"✓ actitud: {report.get('actitud', 'N/A')} puntos")
+            print(f"✓ actitud: {len(report.get('actitud', ''))} caracteres")
             print(f"✓ recomendaciones: {len(report.get('recomendaciones', ''))} caracteres")
             
             print("\n" + "="*70)